@@ -6,15 +6,18 @@ Browser automation helpers for ChatGPT workflows (macOS).
 Features
 - Profile modes:
   - "clone": clones your signed-in Brave/Chrome profile to a temp dir (recommended; works even if your browser is open)
+  - "warm_clone": like "clone", but the copy is kept and re-synced incrementally across launches
   - "persistent": uses your actual profile dir (browser must be CLOSED)
   - "temp": blank temp profile (no cookies)
 - Works with Brave (default) or Chrome.
 - Defensive ChatGPT composer detection (new + legacy domains), popup dismissal.
+- quit_driver(driver): quit the browser and remove its temp profile.
+- wait_for_download(dir, since): poll for a finished download instead of sleeping.
 - Back-compat: move_latest_markdown(download_dir, target_path).
 
 Usage
     driver = create_driver(
-        profile_mode="clone",        # or "persistent" / "temp"
+        profile_mode="clone",        # or "warm_clone" / "persistent" / "temp"
         use_brave=True,              # False to use Chrome
         profile_directory="Default", # e.g., "Default", "Profile 1"
         headless=False
@@ -31,17 +34,21 @@ Usage
 
 import os
 import time
+import errno
+import ctypes
 import shutil
+import stat
 import tempfile
 import random
 import platform
+from concurrent.futures import ThreadPoolExecutor, wait, ALL_COMPLETED
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Optional
 
 import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver import ActionChains
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import (
@@ -57,6 +64,13 @@ HOME = str(Path.home())
 BRAVE_BINARY = "/Applications/Brave Browser.app/Contents/MacOS/Brave Browser"
 CHROME_BINARY = "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
 
+# Subtrees/files inside copied profile folders that Chromium rebuilds on its own:
+# caches, LevelDB info logs (LOG, LOG.old) and LOCK files, stale *.old snapshots, and
+# extension verified_contents.json (re-fetched). LevelDB "NNNNNN.log" files and SQLite
+# "-journal" files are NOT skipped: they hold writes not yet folded into the store.
+_CLONE_IGNORE = shutil.ignore_patterns("*Cache*", "LOG", "LOG.old", "LOCK", "*.old",
+                                       "verified_contents.json")
+
 
 # ────────────────────────────────────────────────────────────────────────────────
 # Path helpers (macOS)
@@ -76,68 +90,219 @@ def _browser_binary(use_brave: bool) -> str:
 
 
 # ────────────────────────────────────────────────────────────────────────────────
-# Profile clone (works even when the real browser is open)
+# Fast file copy (APFS clone → shutil)
 # ────────────────────────────────────────────────────────────────────────────────
 
-def _clone_profile_to_temp(use_brave: bool, profile_directory: str) -> str:
+@lru_cache(maxsize=1)
+def _libsystem():
+    try:
+        lib = ctypes.CDLL("/usr/lib/libSystem.dylib", use_errno=True)
+        lib.clonefile.argtypes = (ctypes.c_char_p, ctypes.c_char_p, ctypes.c_uint32)
+        lib.clonefile.restype = ctypes.c_int
+        return lib
+    except (OSError, AttributeError):
+        return None
+
+def _clonefile(src: str, dst: str) -> bool:
     """
-    Make a lightweight clone of an existing profile to a temp user-data-dir.
-    Returns the temp user-data-dir path that contains the cloned Profile folder.
+    Copy-on-write clone via clonefile(2) (APFS, same volume only).
+    Works for files and whole directory trees; dst must not exist.
+    Returns True on success, False if unsupported or it failed.
+    """
+    lib = _libsystem()
+    if lib is None:
+        return False
+    return lib.clonefile(os.fsencode(src), os.fsencode(dst), 0) == 0
+
+def _fastcopy(src: str, dst: str, st: Optional[os.stat_result] = None) -> str:
+    """
+    Drop-in replacement for shutil.copy2 used by the profile clone:
+      1) APFS clonefile (O(1), metadata included)
+      2) shutil.copyfile (fcopyfile: an in-kernel copy on macOS)
+    Pass src's stat result as st when the caller already has it; times and
+    mode are then applied from it instead of re-statting src.
     """
+    if _clonefile(src, dst):
+        return dst
+    st = st or os.stat(src)
+    shutil.copyfile(src, dst)
+    os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+    os.chmod(dst, stat.S_IMODE(st.st_mode))
+    return dst
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Profile clone (works even when the real browser is open)
+# ────────────────────────────────────────────────────────────────────────────────
+
+# Key state copied from the profile folder (avoid caches to keep it fast)
+_PROFILE_MUST_COPY = (
+    "Cookies", "Cookies-journal",
+    "Network",                 # includes TransportSecurity, etc.
+    "Preferences",
+    "Secure Preferences",
+    "History", "History Provider Cache",
+    "Visited Links",
+    "Login Data", "Login Data-journal",
+    "Login Data For Account", "Login Data For Account-journal",
+    "Web Data",
+    "Shortcuts", "Top Sites",
+    "Sync Data", "Sync App Settings",
+    "Extensions",
+    "IndexedDB", "Local Storage", "Session Storage",
+    "Service Worker",
+)
+
+def _source_profile(use_brave: bool, profile_directory: str):
     src_root = _profile_root(use_brave)                       # e.g., .../Brave-Browser
     src_profile = os.path.join(src_root, profile_directory)   # e.g., .../Brave-Browser/Default
-
     if not os.path.isdir(src_profile):
         raise FileNotFoundError(f"Profile not found: {src_profile}")
+    return src_root, src_profile
+
+def _sync_file(src: str, dst: str, st: Optional[os.stat_result] = None):
+    """Copy src → dst unless dst already has the same (size, mtime)."""
+    st = st or os.stat(src)
+    try:
+        cur = os.stat(dst)
+        if cur.st_size == st.st_size and cur.st_mtime_ns == st.st_mtime_ns:
+            return
+        os.remove(dst)                  # clonefile needs a free destination name
+    except FileNotFoundError:
+        pass
+    _fastcopy(src, dst, st)
+
+def _sync_tree(src: str, dst: str):
+    """One-way, rsync-style sync of a directory (honours _CLONE_IGNORE)."""
+    os.makedirs(dst, exist_ok=True)
+    with os.scandir(src) as it:
+        entries = list(it)
+    ignored = _CLONE_IGNORE(src, [e.name for e in entries])
+    for e in entries:
+        if e.name in ignored:
+            continue
+        target = os.path.join(dst, e.name)
+        try:
+            if e.is_dir(follow_symlinks=False):
+                _sync_tree(e.path, target)
+            elif e.is_file(follow_symlinks=False):
+                _sync_file(e.path, target, e.stat(follow_symlinks=False))
+        except OSError:
+            pass
+
+def _copy_profile_state(src_profile: str, dst_profile: str, sync: bool = False):
+    """
+    Copy the _PROFILE_MUST_COPY entries from src_profile into dst_profile.
+    sync=True only re-copies files whose (size, mtime) changed.
+    """
+    os.makedirs(dst_profile, exist_ok=True)
+
+    def _copy_one(entry: os.DirEntry):
+        dst = os.path.join(dst_profile, entry.name)
+        if entry.is_dir(follow_symlinks=False):     # type comes from readdir, no stat
+            try:
+                if sync:
+                    _sync_tree(entry.path, dst)
+                else:
+                    shutil.copytree(entry.path, dst, dirs_exist_ok=True, ignore=_CLONE_IGNORE,
+                                    copy_function=_fastcopy)
+            except Exception:
+                pass
+        elif entry.is_file(follow_symlinks=False):
+            try:
+                st = entry.stat(follow_symlinks=False)   # one lstat, cached on the entry
+                if sync:
+                    _sync_file(entry.path, dst, st)
+                else:
+                    _fastcopy(entry.path, dst, st)
+            except Exception:
+                pass
+
+    # One directory read gives path + type for every wanted entry; missing ones never show up
+    want = set(_PROFILE_MUST_COPY)
+    with os.scandir(src_profile) as it:
+        entries = [e for e in it if e.name in want]
+
+    # Entries are independent subtrees; copying is metadata/syscall-bound, so threads scale
+    with ThreadPoolExecutor(max_workers=min(16, len(want))) as pool:
+        futures = [pool.submit(_copy_one, e) for e in entries]
+        wait(futures, return_when=ALL_COMPLETED)
+
+def _clone_profile_to_temp(use_brave: bool, profile_directory: str) -> str:
+    """
+    Make a lightweight clone of an existing profile to a temp user-data-dir.
+    Returns the temp user-data-dir path that contains the cloned Profile folder.
+    """
+    src_root, src_profile = _source_profile(use_brave, profile_directory)
 
     tmp_root = tempfile.mkdtemp(prefix="uc-profclone-")       # used as --user-data-dir
     dst_profile = os.path.join(tmp_root, profile_directory)
-    os.makedirs(dst_profile, exist_ok=True)
 
     # Copy small root file that stores channel/features (helps Chromium init)
     for fname in ("Local State",):
         s = os.path.join(src_root, fname)
         if os.path.exists(s):
             try:
-                shutil.copy2(s, os.path.join(tmp_root, fname))
+                _fastcopy(s, os.path.join(tmp_root, fname))     # clonefile on APFS
             except Exception:
                 pass
 
-    # Copy key state from the profile folder (avoid caches to keep it fast)
-    must_copy = [
-        "Cookies", "Cookies-journal",
-        "Network",                 # includes TransportSecurity, etc.
-        "Preferences",
-        "Secure Preferences",
-        "History", "History Provider Cache",
-        "Visited Links",
-        "Login Data", "Login Data-journal",
-        "Login Data For Account", "Login Data For Account-journal",
-        "Web Data",
-        "Shortcuts", "Top Sites",
-        "Sync Data", "Sync App Settings",
-        "Extensions",
-        "IndexedDB", "Local Storage", "Session Storage",
-        "Service Worker",
-    ]
+    # Same APFS volume: snapshot the whole profile copy-on-write in one syscall
+    if _clonefile(src_profile, dst_profile):
+        print(f"[info] Cloned profile '{profile_directory}' (APFS clonefile) → '{tmp_root}'")
+        return tmp_root
 
-    for name in must_copy:
-        src = os.path.join(src_profile, name)
-        dst = os.path.join(dst_profile, name)
-        if os.path.isdir(src):
-            try:
-                shutil.copytree(src, dst, dirs_exist_ok=True)
-            except Exception:
-                pass
-        elif os.path.isfile(src):
+    # Otherwise (other volume / non-APFS) copy key state only
+    _copy_profile_state(src_profile, dst_profile)
+
+    print(f"[info] Cloned profile '{profile_directory}' from '{src_root}' → '{tmp_root}'")
+    return tmp_root
+
+def _warm_clone_profile(use_brave: bool, profile_directory: str) -> str:
+    """
+    Like _clone_profile_to_temp, but the clone lives at a deterministic temp
+    path and is reused across launches:
+      - up to date ('Local State' not older than the source's) → reused as-is
+      - stale → only files whose (size, mtime) changed are re-copied
+    Returns the user-data-dir path. Not removed on quit.
+    """
+    src_root, src_profile = _source_profile(use_brave, profile_directory)
+
+    browser = "brave" if use_brave else "chrome"
+    warm_root = os.path.join(tempfile.gettempdir(), f"uc-warmclone-{browser}-{profile_directory.replace(' ', '_')}")
+    dst_profile = os.path.join(warm_root, profile_directory)
+    src_state = os.path.join(src_root, "Local State")
+    dst_state = os.path.join(warm_root, "Local State")
+
+    if os.path.isdir(dst_profile):
+        try:
+            fresh = os.stat(dst_state).st_mtime >= os.stat(src_state).st_mtime
+        except FileNotFoundError:
+            fresh = False
+        if fresh:
+            print(f"[info] Reusing warm profile clone '{profile_directory}' → '{warm_root}'")
+            return warm_root
+
+        if os.path.exists(src_state):
             try:
-                os.makedirs(os.path.dirname(dst), exist_ok=True)
-                shutil.copy2(src, dst)
+                _sync_file(src_state, dst_state)
             except Exception:
                 pass
+        _copy_profile_state(src_profile, dst_profile, sync=True)
+        print(f"[info] Synced warm profile clone '{profile_directory}' from '{src_root}' → '{warm_root}'")
+        return warm_root
 
-    print(f"[info] Cloned profile '{profile_directory}' from '{src_root}' → '{tmp_root}'")
-    return tmp_root
+    # First launch: full clone into the warm location
+    os.makedirs(warm_root, exist_ok=True)
+    if os.path.exists(src_state):
+        try:
+            _fastcopy(src_state, dst_state)
+        except Exception:
+            pass
+    if not _clonefile(src_profile, dst_profile):
+        _copy_profile_state(src_profile, dst_profile)
+    print(f"[info] Created warm profile clone '{profile_directory}' from '{src_root}' → '{warm_root}'")
+    return warm_root
 
 
 # ────────────────────────────────────────────────────────────────────────────────
@@ -146,7 +311,7 @@ def _clone_profile_to_temp(use_brave: bool, profile_directory: str) -> str:
 
 def create_driver(
     *,
-    profile_mode: str = "clone",        # "clone" (recommended), "persistent", or "temp"
+    profile_mode: str = "clone",        # "clone" (recommended), "warm_clone", "persistent", or "temp"
     use_brave: bool = True,
     profile_directory: str = "Default", # e.g., "Default", "Profile 1", "Profile 2"
     headless: bool = False
@@ -154,6 +319,7 @@ def create_driver(
     """
     Launch undetected-chromedriver with:
       - profile_mode="clone": temp copy of your real profile (keeps cookies, works while browser is open)
+      - profile_mode="warm_clone": like "clone", but the copy is kept and reused by later launches
       - profile_mode="persistent": live profile (browser must be CLOSED; reuses cookies in-place)
       - profile_mode="temp": blank temp profile (no cookies)
     """
@@ -178,8 +344,12 @@ def create_driver(
         user_data_dir = _clone_profile_to_temp(use_brave, profile_directory)
         extra_profile_arg = f"--profile-directory={profile_directory}"
 
+    elif profile_mode == "warm_clone":
+        user_data_dir = _warm_clone_profile(use_brave, profile_directory)
+        extra_profile_arg = f"--profile-directory={profile_directory}"
+
     else:
-        raise ValueError("profile_mode must be 'clone', 'persistent', or 'temp'")
+        raise ValueError("profile_mode must be 'clone', 'warm_clone', 'persistent', or 'temp'")
 
     dbg_port = random.randint(49152, 65535)
     opts = uc.ChromeOptions()
@@ -187,6 +357,7 @@ def create_driver(
     if headless:
         opts.add_argument("--headless=new")
         opts.add_argument("--window-size=1400,1000")
+        opts.add_argument("--blink-settings=imagesEnabled=false")   # nobody looks at the pixels
 
     # Robust, minimal flags
     opts.add_argument("--no-sandbox")
@@ -197,6 +368,19 @@ def create_driver(
     opts.add_argument("--disable-blink-features=AutomationControlled")
     opts.add_argument("--no-first-run")
     opts.add_argument("--no-default-browser-check")
+    # Keep profile background services (sync, updater, Safe Browsing, crash reporting…) from
+    # competing with startup and with the page while we wait on the model
+    opts.add_argument("--disable-background-networking")
+    opts.add_argument("--disable-sync")
+    opts.add_argument("--disable-component-update")
+    opts.add_argument("--disable-domain-reliability")
+    opts.add_argument("--disable-client-side-phishing-detection")
+    opts.add_argument("--disable-default-apps")
+    opts.add_argument("--metrics-recording-only")
+    opts.add_argument("--no-pings")
+    opts.add_argument("--disable-breakpad")
+    opts.add_argument("--disable-renderer-backgrounding")
+    opts.add_argument("--disable-backgrounding-occluded-windows")
     opts.add_argument("--start-maximized")
     opts.add_argument(f"--remote-debugging-port={dbg_port}")
     opts.add_argument(f"--user-data-dir={user_data_dir}")
@@ -212,17 +396,32 @@ def create_driver(
         print(f"[info] {extra_profile_arg}")
 
     driver = uc.Chrome(options=opts, use_subprocess=True, suppress_welcome=True)
-    # For clone/temp modes, mark for cleanup by caller
+    # For clone/temp modes, mark for cleanup by caller (warm_clone is kept for reuse)
     if profile_mode in ("clone", "temp"):
         driver._tmp_profile_dir = user_data_dir
     return driver
 
 
+# ────────────────────────────────────────────────────────────────────────────────
+# Driver teardown
+# ────────────────────────────────────────────────────────────────────────────────
+
+def quit_driver(driver):
+    """Quit the browser and remove its temp profile (clone/temp modes)."""
+    tmp = getattr(driver, "_tmp_profile_dir", None)
+    try:
+        driver.quit()
+    except Exception:
+        pass
+    if tmp and os.path.isdir(tmp):
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
 # ────────────────────────────────────────────────────────────────────────────────
 # DOM/composer readiness
 # ────────────────────────────────────────────────────────────────────────────────
 
-_COMPOSER_SELECTORS = [
+_COMPOSER_SELECTORS = (
     # Most common
     'textarea[data-testid="composer-textarea"]',
     'div[contenteditable="true"][data-testid="composer-textarea"]',
@@ -235,9 +434,9 @@ _COMPOSER_SELECTORS = [
     # Generic fallbacks (last resort)
     '[role="textbox"][contenteditable="true"]',
     '[data-testid="composer:input"]',
-]
+)
 
-_CLICK_PATHS = [
+_CLICK_PATHS = (
     # New chat entry points
     ('css', 'button[data-testid="new-chat-button"]'),
     ('xpath', "//button[contains(., 'New chat')]"),
@@ -247,9 +446,9 @@ _CLICK_PATHS = [
     # Switch to the Chat tab from Explore/Apps
     ('xpath', "//a[.//span[contains(., 'Chat')]]"),
     ('xpath', "//button[.//span[contains(., 'Chat')]]"),
-]
+)
 
-_DISMISS_BUTTON_XPATHS = [
+_DISMISS_BUTTON_XPATHS = (
     "//button[normalize-space(.)='Got it']",
     "//button[normalize-space(.)='OK']",
     "//button[normalize-space(.)='Close']",
@@ -257,13 +456,58 @@ _DISMISS_BUTTON_XPATHS = [
     "//button[contains(., 'Skip')]",
     "//button[contains(., 'Start chatting')]",
     "//button[contains(., 'Continue to chat')]",
-]
+)
 
-_ACCEPT_COOKIES_XPATHS = [
+_ACCEPT_COOKIES_XPATHS = (
     "//button[contains(., 'Accept all')]",
     "//button[contains(., 'Accept') and contains(., 'cookies')]",
     "//button[contains(., 'Allow all')]",
-]
+)
+
+# Rendered-element test shared by the in-page scripts (what Selenium's click/is_displayed would accept)
+_JS_SHOWN = """
+const shown = el => el.getClientRects().length > 0 && getComputedStyle(el).visibility !== 'hidden';
+"""
+
+# Resolve many locators in ONE WebDriver round-trip instead of one find_element each.
+# arguments[0]: [[kind, locator], ...] (kind = 'css' | 'xpath'); arguments[1]: stop at first hit;
+# arguments[2]: per locator, take its first *rendered* match instead of its first match
+_JS_LOCATE_ALL = _JS_SHOWN + """
+const found = [];
+for (const [kind, loc] of arguments[0]) {
+    let el = null;
+    try {
+        if (kind === 'css') {
+            el = arguments[2]
+                ? Array.from(document.querySelectorAll(loc)).find(shown) || null
+                : document.querySelector(loc);
+        } else if (arguments[2]) {
+            const snap = document.evaluate(loc, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            for (let i = 0; i < snap.snapshotLength && !el; i++) {
+                if (shown(snap.snapshotItem(i))) el = snap.snapshotItem(i);
+            }
+        } else {
+            el = document.evaluate(loc, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+        }
+    } catch (e) {}
+    if (el) {
+        found.push(el);
+        if (arguments[1]) break;
+    }
+}
+return found;
+"""
+
+def _locate_all(driver, paths, first_only: bool = False, visible_only: bool = False) -> list:
+    """
+    Return the first match of every ('css'|'xpath', locator) pair that exists,
+    in list order (so earlier locators keep priority). With visible_only, hidden
+    matches are skipped and a locator's first rendered match is used instead.
+    """
+    try:
+        return driver.execute_script(_JS_LOCATE_ALL, [list(p) for p in paths], first_only, visible_only) or []
+    except Exception:
+        return []
 
 def _force_focus_any_textbox_and_type(driver, text: str) -> bool:
     """
@@ -273,11 +517,10 @@ def _force_focus_any_textbox_and_type(driver, text: str) -> bool:
     - Finally click the visual center of the page and type into the active element
     Returns True if keys were sent to a focused editable field.
     """
-    # 1) Known composer selectors
+    # 1) Known composer selectors (all variants in one lookup, in priority order)
     try:
-        for sel in _COMPOSER_SELECTORS:
+        for el in _locate_all(driver, [("css", sel) for sel in _COMPOSER_SELECTORS], visible_only=True):
             try:
-                el = driver.find_element(By.CSS_SELECTOR, sel)
                 if el.is_displayed():
                     el.click()
                     el.send_keys(text)
@@ -346,23 +589,68 @@ def _force_focus_any_textbox_and_type(driver, text: str) -> bool:
 
     return False
 
-def _wait_dom_stable(driver, max_wait=12, poll=0.4):
+# Resolves once the page is loaded and no DOM mutation happened for `quiet_ms`
+_JS_WAIT_DOM_QUIET = """
+const quietMs = arguments[0];
+const done = arguments[arguments.length - 1];
+const start = () => {
+    let timer = null;
+    const obs = new MutationObserver(() => {
+        clearTimeout(timer);
+        timer = setTimeout(finish, quietMs);
+    });
+    function finish() {
+        obs.disconnect();
+        done(true);
+    }
+    obs.observe(document.documentElement, {childList: true, subtree: true, characterData: true});
+    timer = setTimeout(finish, quietMs);
+};
+if (document.readyState === 'complete') start();
+else window.addEventListener('load', start, {once: true});
+"""
+
+# Polling fallback: element count is a structural stability proxy that, unlike
+# innerText, doesn't force a layout flush. -1 while the document is still loading.
+_JS_DOM_NODE_COUNT = """
+if (document.readyState !== 'complete' || !document.body) return -1;
+return document.body.getElementsByTagName('*').length;
+"""
+_MIN_DOM_NODES = 50   # below this the app shell hasn't rendered yet
+
+def _wait_dom_stable(driver, max_wait=12, poll=0.4, quiet_ms=1000):
+    """
+    Wait until the DOM stops changing. A MutationObserver in the page signals
+    after `quiet_ms` without mutations; if the async script can't complete
+    (navigation, timeout), fall back to polling for the remaining budget.
+    """
     end = time.time() + max_wait
-    last_len = 0
+    try:
+        # Script timeout is session-wide: widen it for this one call, then put it back
+        previous = driver.timeouts.script
+        driver.set_script_timeout(max_wait)
+        try:
+            if driver.execute_async_script(_JS_WAIT_DOM_QUIET, quiet_ms):
+                return True
+        finally:
+            driver.set_script_timeout(previous)
+    except WebDriverException:
+        pass
+
+    last_count = 0
     stable_ticks = 0
     while time.time() < end:
         try:
-            ready = driver.execute_script("return document.readyState") == "complete"
-            text = driver.execute_script("return document.body ? document.body.innerText : ''") or ""
-            if ready:
-                if len(text) < 150:
+            count = driver.execute_script(_JS_DOM_NODE_COUNT)
+            if count is not None and count >= 0:
+                if count < _MIN_DOM_NODES:
                     stable_ticks = 0
                 else:
-                    if len(text) == last_len:
+                    if count == last_count:
                         stable_ticks += 1
                     else:
                         stable_ticks = 0
-                    last_len = len(text)
+                    last_count = count
                     if stable_ticks >= 3:
                         return True
         except StaleElementReferenceException:
@@ -370,45 +658,78 @@ def _wait_dom_stable(driver, max_wait=12, poll=0.4):
         time.sleep(poll)
     return False
 
+# Click the first rendered match of each XPath in-page; returns how many were clicked
+_JS_CLICK_XPATHS = _JS_SHOWN + """
+let clicked = 0;
+for (const xp of arguments[0]) {
+    try {
+        const snap = document.evaluate(xp, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        for (let i = 0; i < snap.snapshotLength; i++) {
+            const el = snap.snapshotItem(i);
+            if (shown(el)) {   // hidden/off-layout buttons are skipped, as element.click() refused them
+                el.click();
+                clicked++;
+                break;
+            }
+        }
+    } catch (e) {}
+}
+return clicked;
+"""
+
+_POPUP_XPATHS = _ACCEPT_COOKIES_XPATHS + _DISMISS_BUTTON_XPATHS   # cookie banners first, then modals/tours
+
 def _dismiss_popups(driver):
-    # Cookie banners
-    for xp in _ACCEPT_COOKIES_XPATHS:
-        try:
-            driver.find_element(By.XPATH, xp).click()
-            time.sleep(0.3)
-        except Exception:
-            pass
-    # Generic modals / tours
-    for xp in _DISMISS_BUTTON_XPATHS:
+    try:
+        clicked = driver.execute_script(_JS_CLICK_XPATHS, _POPUP_XPATHS)
+    except Exception:
+        return
+    if clicked:
+        time.sleep(0.3)   # single settle for whatever closed
+
+def _find_any(driver, selectors, timeout=0, visible_only=False):
+    paths = [("css", sel) for sel in selectors]
+    end = time.time() + timeout
+    while True:
+        found = _locate_all(driver, paths, first_only=True, visible_only=visible_only)
+        if found:
+            return found[0]
+        if time.time() >= end:
+            return None
+        time.sleep(0.2)
+
+# Composer element from the last successful lookup. Re-validated with a single
+# is_displayed() before reuse; dropped on navigation (see _navigate).
+_last_composer = None
+
+def _navigate(driver, url: str):
+    """driver.get that also forgets elements cached from the previous document."""
+    global _last_composer
+    _last_composer = None
+    driver.get(url)
+
+def _find_composer(driver, timeout=0):
+    global _last_composer
+    el = _last_composer
+    if el is not None and el.parent is driver:
         try:
-            driver.find_element(By.XPATH, xp).click()
-            time.sleep(0.3)
-        except Exception:
+            if el.is_displayed():
+                return el
+        except (StaleElementReferenceException, WebDriverException):
             pass
+    # Selector priority order, visible matches only: a hidden fallback textarea never wins
+    el = _find_any(driver, _COMPOSER_SELECTORS, timeout=timeout, visible_only=True)
+    _last_composer = el
+    return el
+
+def _clickable_composer(driver):
+    """WebDriverWait condition: the visible, enabled composer, else False."""
+    el = _find_composer(driver)
+    try:
+        return el if el is not None and el.is_enabled() else False
+    except (StaleElementReferenceException, WebDriverException):
+        return False
 
-def _find_any(driver, selectors, timeout=0):
-    if timeout > 0:
-        end = time.time() + timeout
-        while time.time() < end:
-            for sel in selectors:
-                try:
-                    el = driver.find_element(By.CSS_SELECTOR, sel)
-                    if el:
-                        return el
-                except Exception:
-                    continue
-            time.sleep(0.2)
-        return None
-    else:
-        for sel in selectors:
-            try:
-                el = driver.find_element(By.CSS_SELECTOR, sel)
-                if el:
-                    return el
-            except Exception:
-                continue
-        return None
-    
 def _click_omnibox_if_present(driver) -> bool:
     """
     On the new ChatGPT home, the centered 'Ask anything' omnibox hides the composer
@@ -424,9 +745,8 @@ def _click_omnibox_if_present(driver) -> bool:
         "//*[normalize-space()='Ask anything']/ancestor::*[self::div or self::button][1]",
         "//*[contains(., 'Ask anything') and (self::button or self::a)]",
     ]
-    for xp in xpaths:
+    for el in _locate_all(driver, [("xpath", xp) for xp in xpaths]):
         try:
-            el = driver.find_element(By.XPATH, xp)
             if el.is_displayed():
                 try:
                     driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", el)
@@ -467,7 +787,7 @@ def _open_project_and_new_chat(driver, project_url: str, project_name: str = "Pr
         return False
 
     # 1) Go directly to project
-    driver.get(project_url)
+    _navigate(driver, project_url)
     _wait_dom_stable(driver, max_wait=10)
     _dismiss_popups(driver)
 
@@ -543,12 +863,9 @@ def _click_new_chat_if_present(driver):
     return False
 
 def _click_any(driver, paths):
-    for kind, locator in paths:
+    for el in _locate_all(driver, paths):
         try:
-            if kind == 'css':
-                driver.find_element(By.CSS_SELECTOR, locator).click()
-            else:
-                driver.find_element(By.XPATH, locator).click()
+            el.click()
             time.sleep(0.4)
             return True
         except Exception:
@@ -556,7 +873,7 @@ def _click_any(driver, paths):
     return False
 
 def _composer_present(driver):
-    return _find_any(driver, _COMPOSER_SELECTORS, timeout=0) is not None
+    return _find_composer(driver) is not None
 
 def _ensure_composer_ready(driver, tries=4):
     """
@@ -596,23 +913,96 @@ def _focus_and_type(driver, text: str, timeout=20):
     last_err = None
     end = time.time() + timeout
     while time.time() < end:
-        for sel in _COMPOSER_SELECTORS:
-            try:
-                el = driver.find_element(By.CSS_SELECTOR, sel)
-                el.click()
-                el.send_keys(text)
-                return
-            except Exception as e:
-                last_err = e
+        try:
+            el = _find_composer(driver)
+            if el is None:
+                raise NoSuchElementException("no visible composer matched _COMPOSER_SELECTORS")
+            el.click()
+            el.send_keys(text)
+            return
+        except Exception as e:
+            last_err = e
         time.sleep(0.2)
     raise RuntimeError(f"Could not find ChatGPT composer. Last error: {last_err}")
 
+# Last visible code block (already raw markdown) → else the message converted to Markdown
+# in the page: one DOM walk over the small, stable shape ChatGPT renders (p, h1-h6,
+# ul/ol/li, pre>code, strong/em, a, blockquote, table). ATX headings, '*' bullets,
+# UI chrome (copy buttons, icons) dropped. Falls back to innerText if that comes out empty.
+_JS_RESPONSE_PAYLOAD = r"""
+const root = arguments[0];
+const codes = Array.from(root.querySelectorAll('pre code')).filter(c => c.getClientRects().length > 0);
+const code = codes.length ? codes[codes.length - 1].textContent : '';
+if (code.trim()) return {code: code};
+
+const block = s => '\n\n' + s + '\n\n';
+const kids = n => { let s = ''; for (const c of n.childNodes) s += md(c); return s; };
+const wrap = (n, m) => { const s = kids(n).trim(); return s ? m + s + m : ''; };
+const cell = c => kids(c).trim().replace(/\s*\n\s*/g, ' ').replace(/\|/g, '\\|');
+
+function md(n) {
+    if (n.nodeType === 3) return n.nodeValue.replace(/\s+/g, ' ');
+    if (n.nodeType !== 1) return '';
+    const t = n.tagName.toUpperCase();
+    switch (t) {
+        case 'BUTTON': case 'SVG': case 'SCRIPT': case 'STYLE': return '';
+        case 'BR': return '  \n';
+        case 'HR': return block('---');
+        case 'H1': case 'H2': case 'H3': case 'H4': case 'H5': case 'H6':
+            return block('#'.repeat(+t[1]) + ' ' + kids(n).trim());
+        case 'P': return block(kids(n).trim());
+        case 'STRONG': case 'B': return wrap(n, '**');
+        case 'EM': case 'I': return wrap(n, '*');
+        case 'DEL': case 'S': return wrap(n, '~~');
+        case 'CODE': {
+            const s = n.textContent;
+            return s.includes('`') ? '`` ' + s + ' ``' : '`' + s + '`';
+        }
+        case 'PRE': {
+            const c = n.querySelector('code') || n;
+            const lang = ((c.className || '').match(/language-([\w+#.-]+)/) || [])[1] || '';
+            return block('```' + lang + '\n' + c.textContent.replace(/\n$/, '') + '\n```');
+        }
+        case 'A': {
+            const s = kids(n).trim(), href = n.getAttribute('href');
+            return s && href ? '[' + s + '](' + href + ')' : s;
+        }
+        case 'UL': case 'OL': {
+            let i = +(n.getAttribute('start') || 1);
+            const items = [];
+            for (const li of n.children) {
+                if (li.tagName !== 'LI') continue;
+                const mark = t === 'OL' ? (i++) + '. ' : '* ';
+                const body = kids(li).trim().replace(/\n\s*\n/g, '\n');
+                items.push(mark + body.split('\n').join('\n' + ' '.repeat(mark.length)));
+            }
+            return block(items.join('\n'));
+        }
+        case 'BLOCKQUOTE':
+            return block(kids(n).trim().replace(/\n{3,}/g, '\n\n').split('\n')
+                .map(l => l ? '> ' + l : '>').join('\n'));
+        case 'TABLE': {
+            const rows = Array.from(n.querySelectorAll('tr')).map(r => Array.from(r.children).map(cell));
+            if (!rows.length) return '';
+            const lines = rows.map(r => '| ' + r.join(' | ') + ' |');
+            lines.splice(1, 0, '| ' + rows[0].map(() => '---').join(' | ') + ' |');
+            return block(lines.join('\n'));
+        }
+        default: return kids(n);
+    }
+}
+
+const out = md(root).replace(/\n[ \t]+(?=\n)/g, '\n').replace(/\n{3,}/g, '\n\n').trim();
+if (out) return {md: out};
+return {text: root.innerText};
+"""
+
 def extract_last_response_markdown(driver, wait_seconds: int = 60) -> str:
     """
     Returns the Markdown of the most recent assistant message.
     Strategy:
       1) If there's a code block (pre > code), copy its textContent (already raw).
-      2) Else, take the assistant message innerHTML and convert to Markdown.
+      2) Else, convert the assistant message to Markdown in the page (one DOM walk).
     """
     end = time.time() + wait_seconds
 
@@ -638,37 +1028,21 @@ def extract_last_response_markdown(driver, wait_seconds: int = 60) -> str:
     if not last_el:
         raise RuntimeError("No assistant response found in chat.")
 
+    # One round-trip: last visible code block, else in-page Markdown, else innerText
+    payload = driver.execute_script(_JS_RESPONSE_PAYLOAD, last_el) or {}
+
     # 1) Prefer a code block if present (raw markdown-friendly)
-    try:
-        code_blocks = last_el.find_elements(By.CSS_SELECTOR, "pre code")
-        code_blocks = [c for c in code_blocks if c.is_displayed()]
-        if code_blocks:
-            raw = driver.execute_script("return arguments[0].textContent;", code_blocks[-1]) or ""
-            raw = raw.strip()
-            if raw:
-                return raw
-    except Exception:
-        pass
+    raw = (payload.get("code") or "").strip()
+    if raw:
+        return raw
+
+    # 2) Fallback: the message converted to Markdown in the browser
+    converted = (payload.get("md") or "").strip()
+    if converted:
+        return converted
 
-    # 2) Fallback: convert innerHTML → Markdown
-    inner_html = driver.execute_script("return arguments[0].innerHTML;", last_el) or ""
-    inner_html = inner_html.strip()
-    if not inner_html:
-        # last fallback: innerText (may lose some formatting but better than nothing)
-        text = driver.execute_script("return arguments[0].innerText;", last_el) or ""
-        return text.strip()
-
-    # Configure markdownify: ATX headings, keep strong/emphasis, allow tables
-    # markdownify has basic table support; this config keeps structure readable
-    markdown = md(
-        inner_html,
-        heading_style="ATX",
-        bullets="*",
-        strip=["span"],
-        convert=["table", "thead", "tbody", "tr", "th", "td"]
-    ).strip()
-
-    return markdown
+    # last fallback: innerText (may lose some formatting but better than nothing)
+    return (payload.get("text") or "").strip()
 
 def extract_last_fenced_markdown(driver, timeout: int = 120) -> str:
     """
@@ -743,6 +1117,43 @@ def extract_last_fenced_markdown(driver, timeout: int = 120) -> str:
 # ChatGPT actions
 # ────────────────────────────────────────────────────────────────────────────────
 
+_STOP_BUTTON_CSS = '[data-testid="stop-button"], button[aria-label*="Stop"]'
+_SEND_BUTTON_CSS = 'button[data-testid="send-button"]'
+_ASSISTANT_MESSAGE_CSS = '[data-message-author-role="assistant"]'
+_JS_COMPOSER_TEXT = "const el = arguments[0]; return el.tagName === 'TEXTAREA' ? el.value : el.innerText;"
+
+def _prompt_submitted(driver, composer) -> bool:
+    """
+    True once a submit has landed: the stop button is up or the composer was cleared.
+    ChatGPT does both asynchronously after the send, so poll this rather than checking inline.
+    """
+    if driver.find_elements(By.CSS_SELECTOR, _STOP_BUTTON_CSS):
+        return True
+    try:
+        text = driver.execute_script(_JS_COMPOSER_TEXT, composer or driver.switch_to.active_element)
+    except WebDriverException:   # stale/re-rendered composer: not proof either way
+        return False
+    return not (text or "").strip()
+
+def _wait_for_response(driver, timeout: int) -> bool:
+    """
+    Block until the model has finished answering: the stop button shows up while
+    the reply streams and goes away once it's complete.
+    Returns True if completion was observed, False if `timeout` ran out first.
+    """
+    end = time.time() + timeout
+    stop_btn = (By.CSS_SELECTOR, _STOP_BUTTON_CSS)
+    try:
+        WebDriverWait(driver, min(10, timeout)).until(EC.presence_of_element_located(stop_btn))
+    except TimeoutException:
+        pass  # short replies can finish before we ever see the button
+    try:
+        WebDriverWait(driver, max(1, end - time.time())).until_not(EC.presence_of_element_located(stop_btn))
+        WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.CSS_SELECTOR, _ASSISTANT_MESSAGE_CSS)))
+        return True
+    except TimeoutException:
+        return False
+
 def run_chatgpt_blog_prompt(
     prompt: str,
     driver,
@@ -750,91 +1161,178 @@ def run_chatgpt_blog_prompt(
     project_url: Optional[str] = None,
 ):
     """
-    Open the project page, move focus into the New Chat box (via TAB),
-    paste the prompt, press Enter, and wait for the response.
+    Open the project page, wait for the New Chat composer, write the prompt
+    into it, submit, and wait for the response.
+    Raises TimeoutException if the response is still generating after `wait_time`.
     """
     if not project_url:
         raise ValueError("project_url must be provided for project-scoped chat")
 
     # 1. Navigate to project page
-    driver.get(project_url)
+    _navigate(driver, project_url)
     _wait_dom_stable(driver, max_wait=10)
-    time.sleep(1.0)
+    try:
+        # Composer is hydrated and focusable → safe to inject (returns as soon as it is)
+        composer = WebDriverWait(driver, 10, poll_frequency=0.1).until(_clickable_composer)
+    except TimeoutException:
+        composer = None  # fall back to whatever has focus; the injection reports failure
 
     # 2. Press TAB to shift focus from URL bar → composer
     # ActionChains(driver).send_keys(Keys.TAB).perform()
     # time.sleep(0.5)
 
-    # 3. Inject the text into the active element
+    # 3. Inject the text straight into the composer (no clipboard / OS focus involved)
+    #    and submit it with a synthetic Enter in the same call.
     js_code = """
-    const el = document.activeElement;
+    const el = arguments[1] || document.activeElement;
     if (el && (el.tagName === 'TEXTAREA' || el.getAttribute('contenteditable') === 'true')) {
         if (el.tagName === 'TEXTAREA') {
             el.value = arguments[0];
         } else {
             el.innerText = arguments[0];
         }
-        el.dispatchEvent(new Event('input', { bubbles: true }));
+        el.dispatchEvent(new InputEvent('input', { bubbles: true }));
         el.focus();
+        el.dispatchEvent(new KeyboardEvent('keydown', {
+            key: 'Enter', code: 'Enter', keyCode: 13, which: 13, bubbles: true, cancelable: true
+        }));
         return true;
     }
     return false;
     """
-    ok = driver.execute_script(js_code, prompt)
-    if not ok:
+    if not driver.execute_script(js_code, prompt, composer):
         raise RuntimeError("Could not move focus into the chat composer.")
 
-    # 4. Press Enter to actually submit
-    ActionChains(driver).send_keys(Keys.ENTER).perform()
-
-    # 5. Let the model respond
-    time.sleep(wait_time)
-
+    # 4. Only if the synthetic Enter didn't take (no stop button, composer still full)
+    #    click Send, or press a real Enter when there is no usable Send button
+    try:
+        WebDriverWait(driver, 3, poll_frequency=0.1).until(lambda d: _prompt_submitted(d, composer))
+    except TimeoutException:
+        send = _find_any(driver, [_SEND_BUTTON_CSS], visible_only=True)
+        if send is not None and send.is_enabled():
+            send.click()
+        else:
+            (composer or driver.switch_to.active_element).send_keys(Keys.ENTER)
+
+    # 5. Let the model respond (returns as soon as generation finishes). A reply still
+    #    streaming after wait_time would be extracted half-written, so stop here instead.
+    if not _wait_for_response(driver, wait_time):
+        raise TimeoutException(f"ChatGPT response did not finish within {wait_time}s")
+
+
+# Find every requested link in ONE round-trip: texts are read in-page and lowercased once,
+# exact text match first, then a contains() match (links are sometimes buttons).
+# arguments[0]: link texts; returns a parallel list of element | null
+_JS_FIND_LINKS = """
+const nodes = Array.from(document.querySelectorAll('a, button'));
+const texts = nodes.map(n => n.textContent.trim().toLowerCase());
+return arguments[0].map(t => {
+    const want = t.trim().toLowerCase();
+    let i = texts.indexOf(want);
+    if (i < 0) i = texts.findIndex(x => x.includes(want));
+    return i < 0 ? null : nodes[i];
+});
+"""
 
+def wait_for_download(download_dir: str, since: float, timeout: int = 60,
+                      suffix: str = ".md") -> Optional[str]:
+    """
+    Poll download_dir until a *suffix file modified at/after `since` exists and no
+    in-progress Chromium download belongs to it: neither its own `<name>.crdownload`
+    sibling nor any .crdownload started at/after `since`. Stale .crdownload leftovers
+    from older downloads are ignored; a missing download_dir counts as "nothing yet".
+    Returns the newest such path, or None if `timeout` ran out first.
+    """
+    end = time.time() + timeout
+    while True:
+        newest, newest_mtime = None, -1.0
+        partials, fresh_partial = set(), False
+        try:
+            with os.scandir(download_dir) as it:
+                for e in it:
+                    if e.name.endswith(".crdownload"):
+                        partials.add(e.name[:-len(".crdownload")])
+                        try:
+                            fresh_partial = fresh_partial or e.stat().st_mtime >= since
+                        except FileNotFoundError:   # finished and renamed mid-scan
+                            pass
+                    elif e.name.endswith(suffix) and e.is_file():
+                        m = e.stat().st_mtime
+                        if m >= since and m > newest_mtime:
+                            newest, newest_mtime = e.path, m
+        except FileNotFoundError:
+            pass
+        if newest and not fresh_partial and os.path.basename(newest) not in partials:
+            return newest
+        if time.time() >= end:
+            return None
+        time.sleep(0.5)
 
-def click_markdown_links(driver, link_texts: List[str], timeout: int = 60):
+def click_markdown_links(driver, link_texts: List[str], timeout: int = 60,
+                         download_dir: Optional[str] = None):
     """
     Click links in the last assistant message by visible text (e.g., 'blog_post.md').
+    With download_dir, each click returns once its file has finished downloading
+    there (see wait_for_download) instead of after a fixed pause.
     """
-    for text in link_texts:
+    pending = list(link_texts)
+    end = time.time() + timeout
+    while pending:
         try:
-            elem = WebDriverWait(driver, timeout).until(
-                EC.element_to_be_clickable((By.XPATH, f"//a[normalize-space(text())='{text}']"))
-            )
-            elem.click()
-            time.sleep(2)
-        except Exception:
-            # Sometimes links are buttons; try a contains() fallback
+            found = driver.execute_script(_JS_FIND_LINKS, pending) or []
+        except WebDriverException:
+            found = []
+        missing = []
+        for i, text in enumerate(pending):
+            elem = found[i] if i < len(found) else None
+            if elem is None:
+                missing.append(text)
+                continue
             try:
-                elem = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.XPATH, f"//*[self::a or self::button][contains(., '{text}')]"))
-                )
+                # Filesystem mtimes can be coarser than time.time(); allow a second of slack
+                clicked_at = time.time() - 1
                 elem.click()
+            except WebDriverException:
+                missing.append(text)   # not interactable yet; retry on the next poll
+                continue
+            if download_dir is None:
                 time.sleep(2)
-            except Exception as e:
-                raise RuntimeError(f"Could not click link/button with text '{text}'.") from e
+            elif wait_for_download(download_dir, clicked_at, timeout=timeout) is None:
+                print(f"[warn] '{text}' did not finish downloading into {download_dir}")
+        pending = missing
+        if pending:
+            if time.time() >= end:
+                raise RuntimeError(f"Could not click link/button with text '{pending[0]}'.")
+            time.sleep(0.25)
 
 
 # ────────────────────────────────────────────────────────────────────────────────
 # Back-compat shim (optional)
 # ────────────────────────────────────────────────────────────────────────────────
 
-import glob
 def move_latest_markdown(download_dir: str, target_path: str) -> str:
     """
     Find the newest .md in download_dir and move it to target_path.
     Returns the destination path.
     """
     download_dir = str(download_dir)
-    candidates = sorted(
-        glob.glob(os.path.join(download_dir, "*.md")),
-        key=lambda p: os.path.getmtime(p),
-        reverse=True
-    )
-    if not candidates:
+    # scandir: one pass, stat served from the DirEntry; running max, nothing materialized.
+    # mtime, not ctime: on macOS ctime is inode-change time, not creation.
+    src, latest_mtime = None, -1.0
+    with os.scandir(download_dir) as it:
+        for e in it:
+            if e.name.endswith(".md") and e.is_file():
+                m = e.stat().st_mtime
+                if m > latest_mtime:
+                    src, latest_mtime = e.path, m
+    if src is None:
         raise FileNotFoundError(f"No .md files found in {download_dir}")
-    src = candidates[0]
     dest = str(Path(target_path))
     os.makedirs(os.path.dirname(dest), exist_ok=True)
-    os.replace(src, dest)
+    try:
+        os.replace(src, dest)            # same volume: atomic rename, no bytes moved
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(src, dest, copy_function=_fastcopy)
     return dest
\ No newline at end of file
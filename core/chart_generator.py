@@ -1,35 +1,58 @@
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 import matplotlib as mpl
+mpl.use("Agg")   # file output only: no GUI backend / window-server hooks (must precede pyplot)
+import matplotlib.pyplot as plt
 from pathlib import Path
-import json
 from matplotlib.dates import DateFormatter
 import matplotlib.lines as mlines
 from datetime import datetime, timedelta
-from PIL import Image, ImageDraw, ImageFont, ImageOps
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageDraw, ImageFont
 
 mpl.rcParams['font.family'] = 'JetBrains Mono'
 HOME = str(Path.home())
 BLOG_ID = (datetime.now()-timedelta(days=1)).strftime('%B %d, %Y')
 LOGO_PATH = f"{HOME}/Documents/MacTrader/SkyeFX/SkyEngine/assets/skyefx_logo.png"
+EVENT_PALETTE = np.asarray(plt.cm.tab10.colors)
+
+@lru_cache(maxsize=16)
+def _font(name, size):
+    """TrueType face parsed once per (file, size); Pillow's default font if it's missing."""
+    try:
+        return ImageFont.truetype(name, size)
+    except OSError:
+        return ImageFont.load_default()
+
+@lru_cache(maxsize=8)
+def _load_logo(path, max_size=(150, 150)):
+    """Logo decoded, converted to RGBA and thumbnailed once per (path, size); read-only."""
+    logo = Image.open(path).convert("RGBA")
+    logo.thumbnail(max_size, Image.LANCZOS)
+    return logo
 
 def generate_basket_pips_chart(log_file_path, output_image_path):
-    with open(log_file_path) as f:
-        lines = f.readlines()
+    # JSONL → DataFrame in pandas' C reader, timestamps parsed on the way in
+    df = pd.read_json(log_file_path, lines=True, convert_dates=["timestamp"])
 
-    records = [json.loads(line.strip()) for line in lines if line.strip()]
-    df = pd.DataFrame(records)
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    # Partition by type once (one hash pass over 'type' instead of one == scan per kind)
+    by_type = dict(tuple(df.groupby('type', sort=False)))
+    empty = df.iloc[:0]
 
     # Filter only snapshots with pips
-    snapshot_df = df[(df['type'] == 'snapshot') & df['pips'].notnull()].copy()
-    snapshot_df["timestamp_15min"] = snapshot_df["timestamp"].dt.floor("15min")
-
-    # Group by 15-minute intervals
-    basket_pips_15min = snapshot_df.groupby("timestamp_15min")["pips"].sum().reset_index()
+    snapshot_df = by_type.get('snapshot', empty)
+    snapshot_df = snapshot_df[snapshot_df['pips'].notnull()]
+
+    # Sum into 15-minute bins; min_count=1 + dropna keeps only bins that had snapshots
+    basket_pips_15min = (
+        snapshot_df.set_index("timestamp")["pips"]
+        .resample("15min").sum(min_count=1).dropna()
+        .rename_axis("timestamp_15min").reset_index()
+    )
 
     # Extract news events
-    news_events = df[df['type'] == 'news_event']
+    news_events = by_type.get('news_event', empty)
     if not news_events.empty and 'title' in news_events.columns:
         news_df = news_events[['timestamp', 'title']]
     else:
@@ -38,32 +61,35 @@ def generate_basket_pips_chart(log_file_path, output_image_path):
     # Ensure no duplicate events
     news_df = news_df.drop_duplicates(subset=["timestamp", "title"])
 
-    # Assign a unique color per event type
+    # Assign a color per event type (palette cycles past 10 types) and resolve it for
+    # every row in one vectorized map
     unique_events = news_df['title'].unique()
-    event_colors = plt.cm.tab10.colors[:len(unique_events)]
-    color_map = dict(zip(unique_events, event_colors))
+    event_colors = list(EVENT_PALETTE[np.arange(len(unique_events)) % len(EVENT_PALETTE)])
+    color_map = pd.Series(event_colors, index=unique_events, dtype=object)
+    news_df = news_df.assign(color=news_df['title'].map(color_map))
 
     # Plot
     fig, ax = plt.subplots(figsize=(14, 6))
-    ax.plot(basket_pips_15min["timestamp_15min"], basket_pips_15min["pips"], marker='o', label='Total Basket Pips')
+    ax.plot(basket_pips_15min["timestamp_15min"], basket_pips_15min["pips"], marker='o', label='Total Basket Pips',
+            rasterized=True)
 
-    # Plot news lines
-    for _, row in news_df.iterrows():
-        if row['title'] in color_map:
-            ax.axvline(row['timestamp'], color=color_map[row['title']], linestyle=':', linewidth=1.2, alpha=0.9)
-        else:
-            print(f"Missing color for event: {row['title']}")
+    # Plot news lines: one vlines collection spanning the full axes height (like axvline)
+    if not news_df.empty:
+        ax.vlines(news_df['timestamp'], 0, 1, transform=ax.get_xaxis_transform(),
+                  colors=news_df['color'].tolist(),
+                  linestyles=':', linewidths=1.2, alpha=0.9)
 
 
     # Highlight highest and lowest points
-    max_idx = basket_pips_15min['pips'].idxmax()
-    min_idx = basket_pips_15min['pips'].idxmin()
-    max_point = basket_pips_15min.loc[max_idx]
-    min_point = basket_pips_15min.loc[min_idx]
+    # (one pass of argmax/argmin over the raw array also gives the y-limits below)
+    pips = basket_pips_15min['pips'].to_numpy()
+    bins = basket_pips_15min['timestamp_15min']
+    i_max, i_min = pips.argmax(), pips.argmin()
+    y_min, y_max = pips[i_min], pips[i_max]
 
     ax.annotate(
-        f"High: {max_point['pips']:.1f} pips",
-        xy=(max_point['timestamp_15min'], max_point['pips']),
+        f"High: {y_max:.1f} pips",
+        xy=(bins.iloc[i_max], y_max),
         xytext=(5, 10),  # X and Y offset in points
         textcoords='offset points',
         ha='left', va='bottom',
@@ -72,8 +98,8 @@ def generate_basket_pips_chart(log_file_path, output_image_path):
     )
 
     ax.annotate(
-        f"Low: {min_point['pips']:.1f} pips",
-        xy=(min_point['timestamp_15min'], min_point['pips']),
+        f"Low: {y_min:.1f} pips",
+        xy=(bins.iloc[i_min], y_min),
         xytext=(5, -15),
         textcoords='offset points',
         ha='left', va='top',
@@ -82,7 +108,6 @@ def generate_basket_pips_chart(log_file_path, output_image_path):
     )
 
     # Adjust y-limits to make space for labels
-    y_min, y_max = basket_pips_15min["pips"].min(), basket_pips_15min["pips"].max()
     y_range = y_max - y_min
     ax.set_ylim(y_min - 0.1 * y_range, y_max + 0.1 * y_range)
 
@@ -91,8 +116,8 @@ def generate_basket_pips_chart(log_file_path, output_image_path):
 
     # Legend setup for news events
     handles = [
-    mlines.Line2D([], [], color=color_map[title], linestyle=':', label=title)
-    for title in unique_events if title in color_map]
+    mlines.Line2D([], [], color=color, linestyle=':', label=title)
+    for title, color in zip(unique_events, event_colors)]
     ax.legend(handles=handles, loc='lower left', fontsize=8, title="News Events")
 
     ax.set_title(f"Total Basket Pips | {BLOG_ID}")
@@ -111,25 +136,30 @@ def slice_image_for_instagram(input_image_path, output_dir):
     and resizes each to 1080x1080 for Instagram.
     """
     img = Image.open(input_image_path)
+    img.load()   # decode once up front; the workers then only read the pixel data
     width, height = img.size
     part_width = width // 3
 
-    for i in range(3):
+    def _process_slice(i):
         left = i * part_width
         right = (i + 1) * part_width if i < 2 else width
         cropped = img.crop((left, 0, right, height))
 
-        # Pad to square (vertically)
-        square_size = max(cropped.size)
-        padded = ImageOps.pad(cropped, (square_size, square_size), method=Image.BICUBIC, color=(255, 255, 255))
-
-        # Resize to Instagram square size
-        resized = padded.resize((1080, 1080), Image.LANCZOS)
+        # Scale to fit 1080x1080 in one LANCZOS pass, then pad onto a white square canvas
+        scale = 1080 / max(cropped.size)
+        new_w = max(1, round(cropped.width * scale))
+        new_h = max(1, round(cropped.height * scale))
+        resized = Image.new(cropped.mode, (1080, 1080), (255, 255, 255))
+        resized.paste(cropped.resize((new_w, new_h), Image.LANCZOS), ((1080 - new_w) // 2, (1080 - new_h) // 2))
 
         output_path = Path(output_dir) / f"{Path(input_image_path).stem}_part{i+1}.png"
         resized.save(output_path)
         print(f"✅ Saved Instagram slice: {output_path}")
 
+    # Slices are disjoint and Pillow drops the GIL while resampling/encoding, so threads overlap
+    with ThreadPoolExecutor(max_workers=3) as ex:
+        list(ex.map(_process_slice, range(3)))
+
 
 def generate_instagram_cover(output_path, title, total_pips, top_pairs, logo_path=None):
     # Create base image
@@ -137,14 +167,9 @@ def generate_instagram_cover(output_path, title, total_pips, top_pairs, logo_pat
     draw = ImageDraw.Draw(img)
 
     # Load fonts (JetBrains Mono preferred)
-    try:
-        title_font = ImageFont.truetype("JetBrainsMono-Bold.ttf", 70)
-        pips_font = ImageFont.truetype("JetBrainsMono-Regular.ttf", 50)
-        small_font = ImageFont.truetype("JetBrainsMono-Regular.ttf", 40)
-    except:
-        title_font = ImageFont.load_default()
-        pips_font = ImageFont.load_default()
-        small_font = ImageFont.load_default()
+    title_font = _font("JetBrainsMono-Bold.ttf", 70)
+    pips_font = _font("JetBrainsMono-Regular.ttf", 50)
+    small_font = _font("JetBrainsMono-Regular.ttf", 40)
 
     # Draw title
     draw.text((60, 200), title, font=title_font, fill="white")
@@ -161,10 +186,8 @@ def generate_instagram_cover(output_path, title, total_pips, top_pairs, logo_pat
 
     # Optional logo overlay
     if logo_path and Path(logo_path).exists():
-        logo = Image.open(logo_path).convert("RGBA")
-        # Resize to fit (e.g., 150x150 max)
-        max_logo_size = (150, 150)
-        logo.thumbnail(max_logo_size, Image.LANCZOS)
+        # Resized to fit 150x150 max (cached across covers)
+        logo = _load_logo(str(logo_path))
 
         # Paste in bottom-right with padding
         logo_x = img.width - logo.width - 40
@@ -182,12 +205,8 @@ def generate_generic_instagram_cover(output_path, main_title, sub_title, logo_pa
     draw = ImageDraw.Draw(img)
 
     # Load fonts
-    try:
-        main_font = ImageFont.truetype("JetBrainsMono-Bold.ttf", 90)
-        sub_font = ImageFont.truetype("JetBrainsMono-Regular.ttf", 55)
-    except:
-        main_font = ImageFont.load_default()
-        sub_font = ImageFont.load_default()
+    main_font = _font("JetBrainsMono-Bold.ttf", 90)
+    sub_font = _font("JetBrainsMono-Regular.ttf", 55)
 
     # Helper: manually break text after N characters
     def draw_manual_break(draw, text, font, start_y, fill, max_chars=25, line_spacing=10):
@@ -214,9 +233,7 @@ def generate_generic_instagram_cover(output_path, main_title, sub_title, logo_pa
 
     # Optional logo overlay
     if logo_path and Path(logo_path).exists():
-        logo = Image.open(logo_path).convert("RGBA")
-        max_logo_size = (150, 150)
-        logo.thumbnail(max_logo_size, Image.LANCZOS)
+        logo = _load_logo(str(logo_path))
 
         logo_x = img.width - logo.width - 40
         logo_y = img.height - logo.height - 40
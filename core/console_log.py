@@ -0,0 +1,55 @@
+"""
+Console logging for the batch scripts (daily post, signal brief, monthly recap).
+
+Records from the `core` loggers are put on a queue by the caller and written to stdout
+by a QueueListener thread, so a run that saves/commits many files never blocks on a
+synchronous stdout write per message. The status emoji lives in the formatter, keyed
+by level, instead of being pasted into every message:
+
+    configure_console_logging()
+    logging.getLogger("core.post_saver").info("Pushed files to repo")   # ✅ Pushed files to repo
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+
+LEVEL_ICONS = {
+    logging.DEBUG: "ℹ️",
+    logging.INFO: "✅",
+    logging.WARNING: "⚠️",
+    logging.ERROR: "❌",
+    logging.CRITICAL: "❌",
+}
+
+class IconFormatter(logging.Formatter):
+    """Prefix each message with its level's emoji; `extra={"icon": ...}` overrides it."""
+    def format(self, record):
+        if not getattr(record, "icon", None):
+            record.icon = LEVEL_ICONS.get(record.levelno, "")
+        return super().format(record)
+
+_queue = None
+_listener = None
+
+def configure_console_logging(level=logging.INFO, logger_name="core"):
+    """
+    Attach the queued stdout handler to `logger_name` (idempotent per logger; flushed at exit).
+    The logger stops propagating, so a root `basicConfig` set up elsewhere (oanda_client's
+    engine log file) doesn't get a second copy of every record.
+    """
+    global _queue, _listener
+    if _listener is None:
+        _queue = queue.SimpleQueue()
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(IconFormatter("%(icon)s %(message)s"))
+        _listener = logging.handlers.QueueListener(_queue, handler)
+        _listener.start()
+        atexit.register(_listener.stop)   # drains whatever is still queued
+
+    log = logging.getLogger(logger_name)
+    if not any(isinstance(h, logging.handlers.QueueHandler) and h.queue is _queue for h in log.handlers):
+        log.addHandler(logging.handlers.QueueHandler(_queue))
+    log.propagate = False
+    log.setLevel(level)
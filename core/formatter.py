@@ -1,11 +1,17 @@
 # core/formatter.py
 # -*- coding: utf-8 -*-
 from datetime import datetime, timezone, timedelta
+import json
+import logging
+import os
 import re
 import yaml
+from functools import lru_cache
 from slugify import slugify
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Regexes & constants
 # ──────────────────────────────────────────────────────────────────────────────
@@ -15,63 +21,152 @@ REQUIRED_FIELDS = [
     "tags", "description"
 ]
 
+# One match yields both the YAML block and the body after it
 FRONTMATTER_RE = re.compile(
-    r'^\s*---\s*\n(.*?)\n---\s*(?:\n|$)',
-    flags=re.DOTALL | re.MULTILINE
+    r'\A\s*---\s*\n(?P<data>.*?)\n---\s*(?:\n|\Z)(?P<body>.*)',
+    flags=re.DOTALL
 )
 
 H1_RE          = re.compile(r'^\s*#\s+(.+?)\s*$', re.MULTILINE)
-ISO8601_Z_RE   = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z$")
+ISO8601_Z_RE   = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z")   # fullmatch
+
+# Searched over the whole body: offsets locate the section without splitting the document
+PERF_H3_PAT    = re.compile(r'^[ \t]*###[ \t]+Performance[ \t]+Drivers[ \t]*$', re.IGNORECASE | re.MULTILINE)
+NEXT_H3_RE     = re.compile(r'^[ \t]*### ', re.MULTILINE)
 
-PERF_H3_PAT    = re.compile(r'^\s*###\s+Performance\s+Drivers\s*$', re.IGNORECASE)
-TABLE_ROW_PAT  = re.compile(r'^\s*\|.*\|\s*$')
+# Blank lines and lines that open a heading/rule/table/list/quote/html/fence block
+# (rules '---'/'***' are covered by the '-'/'*' list markers)
+STRUCTURAL_LINE_RE = re.compile(r'\s*(?:$|[#|\-*+><]|```)')   # .match
 
 CANON_TABLE_HEADER = "| Currency Pair | Starting Pips | Ending Pips |"
 CANON_TABLE_RULE   = "| --- | ---: | ---: |"
 
+
+def _norm_row(s: str) -> str:
+    # normalize a pipe row for comparison: lowercase, trim cells, collapse spaces
+    # (str.split() trims and collapses whitespace runs in one C call, no regex per cell)
+    s = s.strip().strip("|").lower()
+    return "|".join(" ".join(p.split()) for p in s.split("|"))
+
+CANON_HDR_NORM  = _norm_row(CANON_TABLE_HEADER)
+CANON_RULE_NORM = _norm_row(CANON_TABLE_RULE)
+# Any row normalizing to the header must contain its first word: a cheap pre-filter
+CANON_HDR_KEY   = CANON_HDR_NORM.split(" ", 1)[0]
+
 # ──────────────────────────────────────────────────────────────────────────────
-# YAML style: keep ISO strings unquoted (same behavior you had)
+# YAML loading: keep numbers/dates as strings when needed (same as your previous behavior)
 # ──────────────────────────────────────────────────────────────────────────────
 
-def _literal_str_presenter(dumper, data):
-    if ISO8601_Z_RE.match(data):
-        return dumper.represent_scalar('tag:yaml.org,2002:str', data, style=None)
-    return dumper.represent_scalar('tag:yaml.org,2002:str', data)
+_yaml_hooks_installed = False
 
-yaml.add_representer(str, _literal_str_presenter)
-# Keep numbers as strings when needed (same as your previous behavior)
-for ch in "0123456789":
-    yaml.resolver.Resolver.yaml_implicit_resolvers.pop(ch, None)
+def _install_yaml_hooks():
+    # Mutates PyYAML's global resolver table, so it runs on first use rather than at import
+    global _yaml_hooks_installed
+    if _yaml_hooks_installed:
+        return
+    for ch in "0123456789":
+        yaml.resolver.Resolver.yaml_implicit_resolvers.pop(ch, None)
+    _yaml_hooks_installed = True
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Frontmatter emitter: the shape is fixed (scalars + a short list of tags), so it is
+# written directly instead of running PyYAML's full emitter for every post
+# ──────────────────────────────────────────────────────────────────────────────
+
+YAML_RESERVED    = frozenset({"~", "null", "true", "false", "yes", "no", "on", "off", "y", "n"})
+YAML_NUMBER_RE   = re.compile(r"[-+]?(?:\.?\d[\d_]*(?:\.\d*)?(?:e[-+]?\d+)?|\.inf|\.nan)|0x[0-9a-f]+|0o[0-7]+",
+                              re.IGNORECASE)
+YAML_INDICATORS  = tuple("-?:,[]{}#&*!|>'\"%@`")
+# Characters JSON leaves raw but YAML treats as line breaks (NEL, LS, PS) or rejects as non-printable
+YAML_UNSAFE_CHARS_RE = re.compile("[\x7f-\x9f\u2028\u2029\ufffe\uffff]")
+
+class _StockResolver(yaml.resolver.Resolver):
+    """YAML 1.1 implicit typing as yaml.safe_load applies it (before _install_yaml_hooks)."""
+_StockResolver.yaml_implicit_resolvers = {
+    ch: list(resolvers) for ch, resolvers in yaml.resolver.Resolver.yaml_implicit_resolvers.items()
+}
+_STOCK_RESOLVER = _StockResolver()
+_YAML_STR_TAG = "tag:yaml.org,2002:str"
+
+def _needs_quotes(s: str) -> bool:
+    if ISO8601_Z_RE.fullmatch(s):
+        return False  # keep ISO strings unquoted
+    return (
+        not s or s != s.strip() or not s.isprintable()
+        or s.startswith(YAML_INDICATORS)
+        or ":" in s or "#" in s or '"' in s
+        or s.lower() in YAML_RESERVED
+        or YAML_NUMBER_RE.fullmatch(s) is not None
+        # anything safe_load would read as a non-string: dates, 0b/octal/sexagesimal ints, …
+        or _STOCK_RESOLVER.resolve(yaml.ScalarNode, s, (True, False)) != _YAML_STR_TAG
+    )
+
+def _quote(s: str) -> str:
+    # JSON string escapes are a subset of YAML double-quoted escapes; the few characters
+    # JSON passes through that YAML would break or reject get \u escapes as well
+    return YAML_UNSAFE_CHARS_RE.sub(lambda m: f"\\u{ord(m.group()):04x}", json.dumps(s, ensure_ascii=False))
+
+def _emit_scalar(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if value is None:
+        return "null"
+    if isinstance(value, (int, float)):
+        return str(value)
+    s = str(value)
+    return _quote(s) if _needs_quotes(s) else s
+
+def _emit_list(key: str, items) -> str:
+    if not items:
+        return f"{key}: []\n"
+    return f"{key}:\n" + "".join(f"- {_emit_scalar(item)}\n" for item in items)
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Helpers
 # ──────────────────────────────────────────────────────────────────────────────
 
-def _iso_now_z():
-    return datetime.now(timezone.utc).replace(microsecond=0).strftime("%Y-%m-%dT%H:%M:%SZ")
+def _iso_now_z(now=None):
+    now = now or datetime.now(timezone.utc)
+    return now.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+@lru_cache(maxsize=256)
+def _normalize_iso(value: str) -> str:
+    # pure str → str, so pub/mod datetimes and timestamps repeated across a batch parse once
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    except ValueError:
+        return value.strip('"')
 
 def ensure_iso8601_string(value):
     if isinstance(value, datetime):
         return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
     if isinstance(value, str):
-        try:
-            dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
-            return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
-        except ValueError:
-            return value.strip('"')
+        return _normalize_iso(value)
     return str(value)
 
+def _split_frontmatter(raw_content: str):
+    """
+    Return (frontmatter dict, body without the frontmatter) from one regex match.
+    Without a leading frontmatter block: ({}, raw_content.lstrip()).
+    """
+    m = FRONTMATTER_RE.match(raw_content)
+    if not m:
+        return {}, raw_content.lstrip()
+    _install_yaml_hooks()
+    try:
+        data = yaml.safe_load(m["data"]) or {}
+    except yaml.YAMLError:
+        data = {}
+    return (data if isinstance(data, dict) else {}), m["body"].lstrip()
+
 def extract_existing_frontmatter(raw_content: str) -> dict:
-    m = FRONTMATTER_RE.search(raw_content)
-    if m:
-        try:
-            return yaml.safe_load(m.group(1)) or {}
-        except yaml.YAMLError:
-            return {}
-    return {}
+    return _split_frontmatter(raw_content)[0]
 
 def strip_frontmatter(raw_content: str) -> str:
-    return FRONTMATTER_RE.sub("", raw_content, count=1).lstrip()
+    # Body only: slice at the match instead of parsing the YAML or substituting
+    m = FRONTMATTER_RE.match(raw_content)
+    return raw_content[m.start("body"):].lstrip() if m else raw_content.lstrip()
 
 def _first_h1_and_body(md: str):
     """
@@ -97,22 +192,15 @@ def _first_paragraph_after_h1(md_from_h1: str) -> str:
     i = 0
     # skip blanks, headings, rules, list/table/html/fence lines
     while i < len(lines):
-        s = lines[i].strip()
-        if (
-            not s or s.startswith("#") or s in ("---", "***")
-            or s.startswith(("|", "-", "*", "+", ">", "<", "```"))
-        ):
+        if STRUCTURAL_LINE_RE.match(lines[i]):
             i += 1
             continue
         break
 
-    # gather paragraph until a structural break
+    # gather paragraph until a blank line or structural break
     para = []
-    while i < len(lines) and lines[i].strip():
-        s = lines[i].strip()
-        if s.startswith(("|", "-", "*", "+", ">", "<", "```", "#")):
-            break
-        para.append(s)
+    while i < len(lines) and not STRUCTURAL_LINE_RE.match(lines[i]):
+        para.append(lines[i].strip())
         i += 1
 
     desc = " ".join(para).strip()
@@ -125,12 +213,18 @@ def _validate_and_format_frontmatter(frontmatter_dict: dict) -> str:
     for field in REQUIRED_FIELDS:
         if field not in frontmatter_dict:
             raise ValueError(f"Missing required frontmatter field: '{field}'")
-    return yaml.safe_dump(
-        frontmatter_dict,
-        default_flow_style=False,
-        allow_unicode=True,
-        sort_keys=False
-    )
+    parts = []
+    for key, value in frontmatter_dict.items():
+        if isinstance(value, (list, tuple)) and not any(isinstance(v, (dict, list, tuple)) for v in value):
+            parts.append(_emit_list(key, value))
+        elif isinstance(value, (dict, list, tuple)):
+            # Not a shape we produce; let PyYAML handle the odd nested value
+            _install_yaml_hooks()
+            parts.append(yaml.safe_dump({key: value}, default_flow_style=False,
+                                        allow_unicode=True, sort_keys=False))
+        else:
+            parts.append(f"{key}: {_emit_scalar(value)}\n")
+    return "".join(parts)
 
 def inject_chart_image(content_body: str, date_str: str) -> str:
     """
@@ -148,31 +242,22 @@ def inject_chart_image(content_body: str, date_str: str) -> str:
 </div>
 """.strip()
 
-    lines = content_body.splitlines()
-
     # Find "### Performance Drivers" header
-    h_idx = -1
-    for i, ln in enumerate(lines):
-        if PERF_H3_PAT.match(ln):
-            h_idx = i
-            break
-    if h_idx == -1:
-        print("⚠️  Injection point not found — skipping image injection.")
+    m = PERF_H3_PAT.search(content_body)
+    if not m:
+        logger.warning("Injection point not found — skipping image injection.")
         return content_body
 
-    before = lines[:h_idx]
-    after  = lines[h_idx:]
+    at = m.start()   # start of the header line
 
     # ensure one blank line before/after the block for clean markdown rendering
-    out = []
-    out.extend(before)
-    if out and out[-1].strip():
-        out.append("")
-    out.append(img_block)
-    out.append("")
-    out.extend(after)
+    # (only the line above the header is inspected; the body is copied once, into the result)
+    prev_start = content_body.rfind("\n", 0, max(at - 1, 0)) + 1
+    gap = "\n" if content_body[prev_start:at].strip() else ""
+    before = content_body[:at].lstrip()
+    after  = content_body[at:].rstrip()
 
-    return "\n".join(out).strip() + "\n"
+    return f"{before}{gap}{img_block}\n\n{after}\n"
 
 
 def _ensure_performance_table(body: str) -> str:
@@ -181,33 +266,15 @@ def _ensure_performance_table(body: str) -> str:
     header + alignment row, and DO NOT duplicate if it already exists.
     If a table is present without a header, insert the header above the first row.
     """
-    def norm_row(s: str) -> str:
-        # normalize a pipe row for comparison: lowercase, trim cells, collapse spaces
-        s = s.strip().strip("|")
-        parts = [re.sub(r"\s+", " ", p.strip().lower()) for p in s.split("|")]
-        return "|".join(parts)
-
-    canon_hdr_norm = norm_row(CANON_TABLE_HEADER)
-    canon_rule_norm = norm_row(CANON_TABLE_RULE)
-
-    lines = body.splitlines()
-
-    # 1) Find '### Performance Drivers' section bounds
-    h_idx = -1
-    for i, ln in enumerate(lines):
-        if PERF_H3_PAT.match(ln):
-            h_idx = i
-            break
-    if h_idx == -1:
+    # 1) Find '### Performance Drivers' section bounds (only the section gets split)
+    m = PERF_H3_PAT.search(body)
+    if not m:
         return body
 
-    end = len(lines)
-    for j in range(h_idx + 1, len(lines)):
-        if lines[j].lstrip().startswith("### "):
-            end = j
-            break
+    nxt = NEXT_H3_RE.search(body, m.end())
+    end = nxt.start() if nxt else len(body)
 
-    sec = lines[h_idx+1:end]
+    sec = body[m.end():end].splitlines()[1:]   # [0] is the rest of the header line
     if not sec:
         return body
 
@@ -215,11 +282,13 @@ def _ensure_performance_table(body: str) -> str:
     first_table_idx = -1
     header_positions = []
     for k, ln in enumerate(sec):
-        if not TABLE_ROW_PAT.match(ln.strip()):
+        s = ln.strip()
+        # pipe row: starts and ends with '|' (two plain string tests, no regex VM)
+        if len(s) < 2 or not (s.startswith("|") and s.endswith("|")):
             continue
         if first_table_idx == -1:
             first_table_idx = k
-        if norm_row(ln) == canon_hdr_norm:
+        if CANON_HDR_KEY in s.lower() and _norm_row(s) == CANON_HDR_NORM:
             header_positions.append(k)
 
     if first_table_idx == -1:
@@ -238,7 +307,7 @@ def _ensure_performance_table(body: str) -> str:
 
         # After potential deletions, recompute keep_idx context
         # Ensure there is exactly ONE alignment rule right after the header
-        if keep_idx + 1 >= len(new_sec) or norm_row(new_sec[keep_idx + 1]) != canon_rule_norm:
+        if keep_idx + 1 >= len(new_sec) or _norm_row(new_sec[keep_idx + 1]) != CANON_RULE_NORM:
             # If there is an existing rule (non-canonical), replace it; otherwise insert
             if keep_idx + 1 < len(new_sec) and ("---" in new_sec[keep_idx + 1]):
                 new_sec[keep_idx + 1] = CANON_TABLE_RULE
@@ -258,8 +327,8 @@ def _ensure_performance_table(body: str) -> str:
         new_sec.insert(insert_at, CANON_TABLE_HEADER)
 
     # 4) Reassemble the document
-    out = lines[:h_idx+1] + new_sec + lines[end:]
-    return "\n".join(out).strip() + "\n"
+    section = "\n".join(new_sec)
+    return f"{body[:m.end()]}\n{section}\n{body[end:]}".strip() + "\n"
 
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -279,11 +348,22 @@ def format_markdown(content: str) -> str:
     if not content or not content.strip():
         return content
 
-    now_iso = _iso_now_z()
-
-    # 1) Parse & strip any existing frontmatter
-    existing = extract_existing_frontmatter(content)
-    body     = strip_frontmatter(content)
+    # One clock read: local time for the chart date, its UTC form for the frontmatter
+    now = datetime.now().astimezone()
+    now_iso = _iso_now_z(now)
+
+    # 1) Parse & strip any existing frontmatter (single pass)
+    existing, body = _split_frontmatter(content)
+
+    # Already formatted (e.g. a defensive re-run via update_markdown_file): complete
+    # frontmatter, one canonical table header and this run's chart → nothing to rebuild
+    date_str = (now - timedelta(days=1)).strftime('%Y-%m-%d')
+    if (
+        all(k in existing for k in REQUIRED_FIELDS)
+        and body.count(CANON_TABLE_HEADER) == 1
+        and f"/assets/pips_chart_{date_str}.png" in body
+    ):
+        return content
 
     # 2) Title via first H1 (preferred)
     title_from_h1, body_from_h1 = _first_h1_and_body(body)
@@ -306,9 +386,12 @@ def format_markdown(content: str) -> str:
         description = _first_paragraph_after_h1(body) or "Daily FX market movements and macro highlights."
 
     # 4) Frontmatter fields
-    pub_datetime = ensure_iso8601_string(existing.get("pubDatetime", now_iso))
-    mod_datetime = ensure_iso8601_string(existing.get("modDatetime", now_iso))
-    slug         = existing.get("slug", slugify(title))
+    # `or` rather than .get defaults: slugify/normalization only run when actually needed
+    pub_datetime = existing.get("pubDatetime")
+    pub_datetime = ensure_iso8601_string(pub_datetime) if pub_datetime else now_iso
+    mod_datetime = existing.get("modDatetime")
+    mod_datetime = ensure_iso8601_string(mod_datetime) if mod_datetime else now_iso
+    slug         = existing.get("slug") or slugify(title)
     tags         = existing.get("tags", ["forex", "skyengine", "analysis", "algotrading"])
     if isinstance(tags, str):
         tags = [t.strip() for t in tags.split(",") if t.strip()]
@@ -332,11 +415,24 @@ def format_markdown(content: str) -> str:
     body = _ensure_performance_table(body)
 
     # 6) Inject chart image before Performance Drivers (yesterday date)
-    date_str = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
     body = inject_chart_image(body, date_str)
 
-    # 7) Assemble final doc
-    return f"---\n{yaml_block}---\n\n{body}".rstrip() + "\n"
+    # 7) Assemble final doc: one join, so the (large) body is copied once, not per concat
+    return "".join(("---\n", yaml_block, "---\n\n", body.rstrip(), "\n"))
+
+def write_text_atomic(path, text: str):
+    """
+    Write `text` (UTF-8) to `path` via a sibling temp file + os.replace, so readers
+    (git add, the Astro build) see either the old file or the new one, never a partial write.
+    The temp file is fsynced first, so after a crash the replaced file isn't empty or truncated.
+    """
+    path = os.fspath(path)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(text.encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
 
 def update_markdown_file(path):
     path = Path(path)
@@ -345,5 +441,6 @@ def update_markdown_file(path):
 
     raw = path.read_text(encoding='utf-8')
     new = format_markdown(raw)
-    path.write_text(new, encoding='utf-8')
-    print(f"✅ Updated frontmatter in {path.name}")
\ No newline at end of file
+    if new is not raw:
+        write_text_atomic(path, new)
+    logger.info("Updated frontmatter in %s", path.name)
\ No newline at end of file
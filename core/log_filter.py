@@ -0,0 +1,168 @@
+"""
+Snapshot / news-event filtering shared by the daily post (proto_main) and the monthly recap.
+
+`extract_filtered_logs` does the per-minute basket bucketing in one pandas groupby and
+returns the structured summary the monthly recap reads; `select_prompt_logs` picks the
+deduped, time-sorted entries the daily prompt is built from and `filtered_logs_to_text`
+serializes them as JSON lines.
+"""
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+import orjson
+import pandas as pd
+
+
+# Date, HH:MM and UTC offset of an ISO-8601 timestamp ("T" or space separated, optional fraction)
+_ISO_PARTS_RE = r"^(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2}):\d{2}(?:\.\d+)?(Z|[+-]\d{2}:\d{2})?$"
+
+
+def _minute_keys(timestamps):
+    """
+    ISO minute key ("YYYY-MM-DDTHH:MM:00[+HH:MM]", as `isoformat()` writes it) per timestamp.
+    Canonical text sharing one offset is cut to the minute without parsing any datetime;
+    anything else (other layouts, mixed offsets) is parsed and floored, mixed offsets in UTC.
+    """
+    parts = timestamps.str.extract(_ISO_PARTS_RE)
+    offsets = parts[2].fillna("").replace("Z", "+00:00")
+    if parts[0].notna().all() and offsets.nunique() <= 1:
+        return parts[0] + "T" + parts[1] + ":00" + offsets
+
+    try:
+        parsed = pd.to_datetime(timestamps, cache=True)
+        if not pd.api.types.is_datetime64_any_dtype(parsed):
+            raise ValueError("mixed UTC offsets")
+    except ValueError:
+        parsed = pd.to_datetime(timestamps, utc=True, cache=True)
+    return pd.Series([ts.isoformat() for ts in parsed.dt.floor("min")], index=timestamps.index)
+
+
+def extract_filtered_logs(logs):
+    # One pass over the entries, dispatching on type (news deduped by title + timestamp)
+    snapshots = []
+    news_events = []
+    seen_news = set()
+    for log in logs:
+        log_type = log["type"]
+        if log_type == "snapshot":
+            snapshots.append(log)
+        elif log_type == "news_event":
+            identifier = (log["title"], log["timestamp"])
+            if identifier not in seen_news:
+                news_events.append(log)
+                seen_news.add(identifier)
+
+    # Minute buckets in one vectorized pass: truncate the ISO text to the minute, sum pips per bucket.
+    # sort=False keeps first-seen bucket order, so ties in idxmax/idxmin resolve as before.
+    basket_scores = pd.Series(dtype=float)   # ISO minute → basket pips, sorted by minute
+    snapshot_minutes = []                    # ISO minute of each snapshot, aligned with `snapshots`
+    highest_basket_ts = lowest_basket_ts = None
+    if snapshots:
+        # Only the two columns the aggregation reads, not every key of every snapshot dict
+        snap_df = pd.DataFrame(snapshots, columns=["timestamp", "pips"])
+        pips = snap_df["pips"]   # a snapshot without pips is NaN here, which sum() skips
+        buckets = _minute_keys(snap_df["timestamp"])
+        per_minute = pips.groupby(buckets.rename(None), sort=False).sum()
+        basket_scores = per_minute.sort_index()   # one shared offset, so lexical order is chronological
+        snapshot_minutes = buckets.tolist()
+
+        highest_basket_ts, highest_basket_pips = per_minute.idxmax(), per_minute.max().item()
+        lowest_basket_ts, lowest_basket_pips = per_minute.idxmin(), per_minute.min().item()
+
+    summary_entries = []
+    if highest_basket_ts:
+        summary_entries.append({
+            "type": "basket_summary",
+            "label": "Highest Basket",
+            "timestamp": highest_basket_ts,
+            "basket_total_pips": round(highest_basket_pips, 1)
+        })
+    if lowest_basket_ts:
+        summary_entries.append({
+            "type": "basket_summary",
+            "label": "Lowest Basket",
+            "timestamp": lowest_basket_ts,
+            "basket_total_pips": round(lowest_basket_pips, 1)
+        })
+
+    all_snapshots = snapshots
+    first_snapshot = snapshots[0] if snapshots else {}
+    last_snapshot = snapshots[-1] if snapshots else {}
+
+    return {
+        "snapshots": all_snapshots,
+        "news_events": news_events,
+        "summary_entries": summary_entries,
+        "first_snapshot": first_snapshot,
+        "last_snapshot": last_snapshot,
+        "basket_scores": basket_scores,
+        "snapshot_minutes": snapshot_minutes,
+    }
+
+
+def _in_tz(dt, tz):
+    """`dt` expressed with the minute keys' offset (naive stays naive), so bounds bisect as text."""
+    if tz is None:
+        return dt.replace(tzinfo=None)
+    return dt.astimezone(tz) if dt.tzinfo else dt.replace(tzinfo=tz)
+
+
+def select_prompt_logs(filtered):
+    """Entries for the daily prompt: news, ±1h / first / last / extreme baskets, summaries; time-sorted."""
+    news_events = filtered["news_events"]
+    summary_entries = filtered["summary_entries"]
+    basket_scores = filtered["basket_scores"]
+
+    basket_groups = {}   # ISO minute → that minute's snapshots, in log order
+    for minute, snap in zip(filtered["snapshot_minutes"], filtered["snapshots"]):
+        basket_groups.setdefault(minute, []).append(snap)
+
+    # Every minute tied for the extreme, not just the one the summary entry names
+    highest_basket = lowest_basket = []
+    if not basket_scores.empty:
+        highest_basket = [snap for ts in basket_scores.index[basket_scores == basket_scores.max()]
+                          for snap in basket_groups[ts]]
+        lowest_basket = [snap for ts in basket_scores.index[basket_scores == basket_scores.min()]
+                         for snap in basket_groups[ts]]
+
+    # Snapshots ±1 hour around news events
+    # (minute keys are sorted ISO strings, so each ±1h window is two bisects on the text itself;
+    # only the event times are parsed, never the basket keys)
+    sorted_basket_times = list(basket_scores.index)
+    related_snapshots = []
+    if news_events and sorted_basket_times:
+        hour = timedelta(hours=1)
+        key_tz = datetime.fromisoformat(sorted_basket_times[0]).tzinfo
+        for event in news_events:
+            event_time = _in_tz(datetime.fromisoformat(event["timestamp"]), key_tz)
+            start = bisect_left(sorted_basket_times, (event_time - hour).isoformat())
+            end = bisect_right(sorted_basket_times, (event_time + hour).isoformat())
+            for ts in sorted_basket_times[start:end]:
+                related_snapshots.extend(basket_groups[ts])
+    # First and last basket of the day
+    first_basket = basket_groups[sorted_basket_times[0]] if sorted_basket_times else []
+    last_basket = basket_groups[sorted_basket_times[-1]] if sorted_basket_times else []
+    # Combine and deduplicate
+    combined_logs = (
+        news_events +
+        related_snapshots +
+        first_basket +
+        last_basket +
+        highest_basket +
+        lowest_basket +
+        summary_entries
+    )
+    # Identity tuple per entry instead of serializing every dict with sort_keys
+    seen = set()
+    unique_logs = []
+    for log in combined_logs:
+        key = (log["type"], log["timestamp"], log.get("title"), log.get("pair"), log.get("label"))
+        if key not in seen:
+            seen.add(key)
+            unique_logs.append(log)
+    return sorted(unique_logs, key=lambda x: x["timestamp"])
+
+
+def filtered_logs_to_text(filtered):
+    """`select_prompt_logs` as JSON lines, the form the daily prompt embeds."""
+    # one C-level encode per entry, joined as bytes and decoded once
+    return b"\n".join(map(orjson.dumps, select_prompt_logs(filtered))).decode("utf-8")
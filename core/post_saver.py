@@ -1,25 +1,44 @@
 import subprocess
 import os
 import datetime
+import logging
 
-def git_commit_and_push(repo_dir, files, date_str=None):
+logger = logging.getLogger(__name__)
+
+def commit_batch(repo_dir, files, message, push=True):
     """
-    Adds, commits, and pushes a list of files to the repo.
+    Stages every path in `files` with one `git add`, makes one commit and (optionally)
+    one push. Callers producing several posts collect their paths and call this once.
+    Returns True on success.
     """
     repo_dir = os.path.expanduser(repo_dir)
-    os.chdir(repo_dir)
-
-    if date_str is None:
-        date_str = datetime.datetime.now().strftime("%Y-%m-%d")
+    if not files:
+        logger.info("Nothing to commit.", extra={"icon": "ℹ️"})
+        return False
 
     try:
-        for file in files:
-            file_path = os.path.expanduser(file)
-            subprocess.run(["git", "add", file_path], check=True)
+        # One `git add` for every file (NUL-separated on stdin) instead of a process per file;
+        # cwd= keeps the caller's working directory untouched
+        paths = "\0".join(os.path.expanduser(f) for f in files)
+        subprocess.run(["git", "add", "--pathspec-from-file=-", "--pathspec-file-nul"],
+                       input=paths, text=True, check=True, cwd=repo_dir)
 
-        commit_message = f"New blog {date_str}"
-        subprocess.run(["git", "commit", "-m", commit_message], check=True)
-        subprocess.run(["git", "push", "origin", "main"], check=True)
-        print(f"✅ Pushed files to repo: {files}")
+        subprocess.run(["git", "commit", "-m", message], check=True, cwd=repo_dir)
+        if push:
+            subprocess.run(["git", "push", "origin", "main"], check=True, cwd=repo_dir)
+            logger.info("Pushed files to repo: %s", files)
+        else:
+            logger.info("Committed files to repo: %s", files)
+        return True
     except subprocess.CalledProcessError as e:
-        print(f"❌ Git command failed: {e}")
+        logger.error("Git command failed: %s", e)
+        return False
+
+def git_commit_and_push(repo_dir, files, date_str=None):
+    """
+    Adds, commits, and pushes a list of files to the repo.
+    """
+    if date_str is None:
+        date_str = datetime.datetime.now().strftime("%Y-%m-%d")
+
+    return commit_batch(repo_dir, files, f"New blog {date_str}")
@@ -1,23 +1,34 @@
-import json
+import logging
 import os
+import pickle
 from datetime import datetime, timedelta
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 from pathlib import Path
+import orjson
 import pandas as pd
+import matplotlib as mpl
+mpl.use("Agg")   # file output only: no GUI backend / window-server hooks (must precede pyplot)
 import matplotlib.pyplot as plt
 import requests
 from dotenv import load_dotenv
 from oanda_client import OandaClient
+from core.console_log import configure_console_logging
+from core.log_filter import extract_filtered_logs
 
 # === CONFIG ===
 LOGS_DIR_FOLDER_ID = datetime.strftime(datetime.now(), "%Y/%B%Y")
 LOGS_DIR = f"/Volumes/MacHDD/Downloads/SkyeFX/blog_logs/{LOGS_DIR_FOLDER_ID}"
 OUTPUT_DIR = f"{LOGS_DIR}/generated_posts"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
+PARSE_CACHE_FILE = os.path.join(OUTPUT_DIR, ".parsed_logs.pickle")   # per-file parsed entries, keyed by mtime/size
 
 STRATEGY_NAME = "BlueFire"
 AUTHOR = "Amber"
 YEAR_MONTH_ID = datetime.strftime(datetime.now(), "%Y-%m")
+LOG_TYPE_MARKERS = (b'"snapshot"', b'"news_event"')   # raw-line prefilter for _parse_log_file
+DEBUG = bool(os.getenv("MURMUR_DEBUG"))   # per-minute / per-cluster debug dumps
 load_dotenv()
 
 OANDA_API_KEY = os.getenv("OANDA_API_KEY")
@@ -25,94 +36,65 @@ OANDA_ACCOUNT_ID = os.getenv("OANDA_ACCOUNT_ID")
 OANDA_BASE_URL = os.getenv("OANDA_BASE_URL")
 OANDA_CLIENT = OandaClient(OANDA_API_KEY)
 
+log = logging.getLogger(__name__)
+
 
 # === FUNCTIONS ===
 
-def load_all_logs(logs_dir):
+def _parse_log_file(path):
+    # Lines stay bytes, broken lines are skipped.
+    # Only lines naming a type extract_filtered_logs reads are handed to the JSON parser.
     entries = []
-    for filename in sorted(os.listdir(logs_dir)):
-        if filename.startswith(f"blog_logs_{YEAR_MONTH_ID}") and filename.endswith(".log"):
-            file_path = os.path.join(logs_dir, filename)
-            with open(file_path, "r") as f:
-                for line in f:
-                    try:
-                        entries.append(json.loads(line))
-                    except json.JSONDecodeError:
-                        continue  # Skip broken lines
+    for line in Path(path).read_bytes().splitlines():
+        if not any(m in line for m in LOG_TYPE_MARKERS):
+            continue
+        try:
+            entries.append(orjson.loads(line))
+        except ValueError:   # orjson.JSONDecodeError
+            continue
     return entries
 
 
-def extract_filtered_logs(logs):
-    snapshots = [log for log in logs if log["type"] == "snapshot"]
-    news_events = []
-    seen_news = set()
-    for log in logs:
-        if log["type"] == "news_event":
-            identifier = (log["title"], log["timestamp"])
-            if identifier not in seen_news:
-                news_events.append(log)
-                seen_news.add(identifier)
-
-    def get_minute_bucket(ts):
-        dt = datetime.fromisoformat(ts)
-        return dt.replace(second=0, microsecond=0).isoformat()
-
-    basket_groups = defaultdict(list)
-    for snap in snapshots:
-        minute_key = get_minute_bucket(snap["timestamp"])
-        basket_groups[minute_key].append(snap)
-
-    basket_scores = {}
-    for ts, snaps in basket_groups.items():
-        total_pips = sum(s["pips"] for s in snaps if "pips" in s)
-        basket_scores[ts] = total_pips
-
-    highest_basket_pips = float('-inf')
-    lowest_basket_pips = float('inf')
-    highest_basket_ts = []
-    lowest_basket_ts = []
-
-    for ts, total_pips in basket_scores.items():
-        if total_pips > highest_basket_pips:
-            highest_basket_pips = total_pips
-            highest_basket_ts = [ts]
-        elif total_pips == highest_basket_pips:
-            highest_basket_ts.append(ts)
-
-        if total_pips < lowest_basket_pips:
-            lowest_basket_pips = total_pips
-            lowest_basket_ts = [ts]
-        elif total_pips == lowest_basket_pips:
-            lowest_basket_ts.append(ts)
-
-    summary_entries = []
-    if highest_basket_ts:
-        summary_entries.append({
-            "type": "basket_summary",
-            "label": "Highest Basket",
-            "timestamp": highest_basket_ts[0],
-            "basket_total_pips": round(highest_basket_pips, 1)
-        })
-    if lowest_basket_ts:
-        summary_entries.append({
-            "type": "basket_summary",
-            "label": "Lowest Basket",
-            "timestamp": lowest_basket_ts[0],
-            "basket_total_pips": round(lowest_basket_pips, 1)
-        })
-
-    all_snapshots = snapshots
-    first_snapshot = snapshots[0] if snapshots else {}
-    last_snapshot = snapshots[-1] if snapshots else {}
+def _read_parse_cache(path):
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return {}
 
-    return {
-        "snapshots": all_snapshots,
-        "news_events": news_events,
-        "summary_entries": summary_entries,
-        "first_snapshot": first_snapshot,
-        "last_snapshot": last_snapshot,
-        "basket_scores": basket_scores
-    }
+
+def _write_parse_cache(path, cache):
+    # temp file + os.replace: a run killed mid-dump never leaves a truncated cache behind
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def load_all_logs(logs_dir, cache_path=PARSE_CACHE_FILE):
+    # scandir keeps the dirent type, so is_file() costs no extra stat (and DirEntry caches
+    # the one stat() for mtime/size); names sorted once
+    prefix = f"blog_logs_{YEAR_MONTH_ID}"
+    with os.scandir(logs_dir) as it:
+        paths = sorted(
+            (e.name, e.path, (e.stat().st_mtime_ns, e.stat().st_size)) for e in it
+            if e.name.startswith(prefix) and e.name.endswith(".log") and e.is_file(follow_symlinks=False)
+        )
+
+    # name → ((mtime_ns, size), entries): only files that are new or changed since the last run
+    # get parsed; cache_path=None parses everything
+    cache = _read_parse_cache(cache_path) if cache_path else {}
+    stale = [(name, path, stamp) for name, path, stamp in paths if cache.get(name, (None,))[0] != stamp]
+
+    # Parsed in-process, in filename order: a month of small daily files is ~0.1s with orjson,
+    # less than spawning workers that re-import this script and pickle every entry back
+    for name, path, stamp in stale:
+        cache[name] = (stamp, _parse_log_file(path))
+
+    names = [name for name, _, _ in paths]
+    if cache_path and (stale or cache.keys() - set(names)):
+        _write_parse_cache(cache_path, {name: cache[name] for name in names})
+    return list(chain.from_iterable(cache[name][1] for name in names))
 
 
 def extract_summary(filtered_data):
@@ -127,27 +109,24 @@ def extract_summary(filtered_data):
     basket_start_date = snapshots[0]["timestamp"][:10]
     basket_end_date = snapshots[-1]["timestamp"][:10]
 
-    timestamps_sorted = sorted(basket_scores.keys())
-    basket_pips_list = []
-
-    print("\n🛠 Basket Scores (Per Minute):")
-    for ts in timestamps_sorted:
-        basket_pips = basket_scores[ts]
-        basket_pips_list.append([ts, basket_pips])
-        print(f"{ts} | Basket Pips: {round(basket_pips, 1)}")
+    # basket_scores is already a minute-sorted Series: frame, extremes and last value read off it
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("Basket Scores (Per Minute):", extra={"icon": "🛠"})
+        for ts, basket_pips in basket_scores.items():
+            log.debug("%s | Basket Pips: %.1f", ts, basket_pips)
 
-    basket_df = pd.DataFrame(basket_pips_list, columns=["timestamp", "basket_pips"])
-    basket_df["timestamp"] = pd.to_datetime(basket_df["timestamp"])
-    basket_df.set_index("timestamp", inplace=True)
+    basket_df = basket_scores.rename("basket_pips").to_frame()
+    basket_df.index = pd.to_datetime(basket_df.index)
+    basket_df.index.name = "timestamp"
 
-    if not basket_pips_list:
+    if basket_scores.empty:
         final_pips = 0
         peak_pips = 0
         max_drawdown_pips = 0
     else:
-        final_pips = basket_pips_list[-1][1]
-        peak_pips = max(p[1] for p in basket_pips_list)
-        max_drawdown_pips = min(p[1] for p in basket_pips_list)
+        final_pips = basket_scores.iat[-1].item()
+        peak_pips = basket_scores.max().item()
+        max_drawdown_pips = basket_scores.min().item()
 
     major_event = None
     for event in news_events:
@@ -175,40 +154,46 @@ def find_top_major_events(news_events, basket_df):
     event_impact = []
     grouped_events = defaultdict(list)
 
-    for event in news_events:
-        event_time = pd.to_datetime(event['timestamp'])
-        event_minute = event_time.replace(second=0, microsecond=0)
+    # All event times parsed in one vectorized call (repeated strings parsed once), floored to the minute
+    event_minutes = pd.to_datetime([event['timestamp'] for event in news_events], cache=True).floor('min')
+    for event_minute, event in zip(event_minutes, news_events):
         grouped_events[event_minute].append(event['title'])
 
-    print("\n🔍 [Debug] Analyzing grouped news event clusters:")
+    log.debug("Analyzing grouped news event clusters:", extra={"icon": "🔍"})
 
+    # basket_df is built from sorted timestamps: each inclusive window is two binary searches
+    idx = basket_df.index
+    pips = basket_df['basket_pips']
     for group_time, titles in grouped_events.items():
         window_start = group_time - timedelta(minutes=60)
         window_end = group_time + timedelta(minutes=60)
-        window_data = basket_df[(basket_df.index >= window_start) & (basket_df.index <= window_end)]
+        lo = idx.searchsorted(window_start, side='left')
+        hi = idx.searchsorted(window_end, side='right')
+        window_data = basket_df.iloc[lo:hi]
 
-        print(f"  - Cluster at {group_time}: {titles}")
-        print(f"    Window: {window_start} to {window_end}")
-        print(f"    Matching snapshots: {len(window_data)}")
+        log.debug("  - Cluster at %s: %s", group_time, titles)
+        log.debug("    Window: %s to %s", window_start, window_end)
+        log.debug("    Matching snapshots: %d", len(window_data))
 
         if not window_data.empty:
-            pips_change = window_data['basket_pips'].iloc[-1] - window_data['basket_pips'].iloc[0]
+            pips_change = pips.iat[hi - 1] - pips.iat[lo]
             event_impact.append({
                 'titles': titles,
                 'time': group_time,
                 'abs_change': abs(pips_change),
                 'real_change': pips_change
             })
-            print(f"    Pips Change: {pips_change:.1f}")
+            log.debug("    Pips Change: %.1f", pips_change)
 
     positive_moves = sorted([e for e in event_impact if e['real_change'] > 0], key=lambda x: x['abs_change'], reverse=True)
     negative_moves = sorted([e for e in event_impact if e['real_change'] < 0], key=lambda x: x['abs_change'], reverse=True)
 
     top_events = positive_moves[:3] + negative_moves[:3]
 
-    print("\n🏆 [Debug] Top 6 Major Event Clusters by Basket Movement:")
+    log.debug("Top 6 Major Event Clusters by Basket Movement:", extra={"icon": "🏆"})
     for idx, event in enumerate(top_events, 1):
-        print(f"  {idx}. {event['titles']} | Basket Change: {event['real_change']:.1f} pips (Abs: {event['abs_change']:.1f}) at {event['time']}")
+        log.debug("  %d. %s | Basket Change: %.1f pips (Abs: %.1f) at %s",
+                  idx, event['titles'], event['real_change'], event['abs_change'], event['time'])
 
     return top_events
 
@@ -268,6 +253,7 @@ Do not wrap the title in quotes or say “Title:”. Format all output as clean
 # === MAIN ===
 
 def main():
+    configure_console_logging(logging.DEBUG if DEBUG else logging.INFO, logger_name=__name__)
     entries = load_all_logs(LOGS_DIR)
     filtered_data = extract_filtered_logs(entries)
     summary = extract_summary(filtered_data)
@@ -295,38 +281,45 @@ def main():
 
     print(f"✅ Blog prompt generated: {prompt_file}")
 
-    # Save the basket pips csv
-    basket_csv = os.path.join(OUTPUT_DIR, f"basket_scores_{summary['basket_end_date']}.csv")
-    summary['basket_df'].to_csv(basket_csv)
-    print(f"✅ Basket scores saved: {basket_csv}")
+    # Plotting (extremes and their values read once, then passed as scalars)
+    pips = summary['basket_df']["basket_pips"]
+    peak_time, peak_pips = pips.idxmax(), pips.max()
+    trough_time, trough_pips = pips.idxmin(), pips.min()
+    final_time, final_pips = pips.index[-1], pips.iat[-1]
 
-    # Plotting
-    plt.figure(figsize=(12, 6))
-    summary['basket_df']["basket_pips"].plot(label="Basket Pips", color="blue")
+    fig = plt.figure(figsize=(12, 6))
+    pips.plot(label="Basket Pips", color="blue")
     plt.title("Basket Pips Over Time")
     plt.xlabel("Time")
     plt.ylabel("Basket Pips")
 
-    peak_time = summary['basket_df']['basket_pips'].idxmax()
-    trough_time = summary['basket_df']['basket_pips'].idxmin()
-    final_time = summary['basket_df'].index[-1]
-
-    plt.scatter(peak_time, summary['basket_df'].loc[peak_time, 'basket_pips'], color='green', label='Peak', zorder=5)
-    plt.scatter(trough_time, summary['basket_df'].loc[trough_time, 'basket_pips'], color='red', label='Trough', zorder=5)
-    plt.scatter(final_time, summary['basket_df'].loc[final_time, 'basket_pips'], color='purple', label='Expiry', zorder=5)
+    plt.scatter(peak_time, peak_pips, color='green', label='Peak', zorder=5)
+    plt.scatter(trough_time, trough_pips, color='red', label='Trough', zorder=5)
+    plt.scatter(final_time, final_pips, color='purple', label='Expiry', zorder=5)
 
-    plt.annotate(f"{summary['basket_df'].loc[peak_time, 'basket_pips']:.1f} pips", (peak_time, summary['basket_df'].loc[peak_time, 'basket_pips']),
+    plt.annotate(f"{peak_pips:.1f} pips", (peak_time, peak_pips),
                  textcoords="offset points", xytext=(0,10), ha='center', fontsize=8, color='green')
-    plt.annotate(f"{summary['basket_df'].loc[trough_time, 'basket_pips']:.1f} pips", (trough_time, summary['basket_df'].loc[trough_time, 'basket_pips']),
+    plt.annotate(f"{trough_pips:.1f} pips", (trough_time, trough_pips),
                  textcoords="offset points", xytext=(0,-15), ha='center', fontsize=8, color='red')
-    plt.annotate(f"{summary['basket_df'].loc[final_time, 'basket_pips']:.1f} pips", (final_time, summary['basket_df'].loc[final_time, 'basket_pips']),
+    plt.annotate(f"{final_pips:.1f} pips", (final_time, final_pips),
                  textcoords="offset points", xytext=(0,10), ha='center', fontsize=8, color='purple')
 
     plt.legend()
     plt.grid(True)
     plt.tight_layout()
     plot_file = os.path.join(OUTPUT_DIR, f"monthly_pips_chart_{summary['basket_end_date']}.png")
-    plt.savefig(plot_file)
+
+    # PNG encode runs on a worker while the CSV is written; the figure is closed once saved
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        saved = ex.submit(fig.savefig, plot_file, dpi=100)
+
+        # Save the basket pips csv
+        basket_csv = os.path.join(OUTPUT_DIR, f"basket_scores_{summary['basket_end_date']}.csv")
+        summary['basket_df'].to_csv(basket_csv)
+        print(f"✅ Basket scores saved: {basket_csv}")
+
+        saved.result()
+    plt.close(fig)
     print(f"✅ Basket scores plot saved: {plot_file}")
 
 
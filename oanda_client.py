@@ -1,8 +1,13 @@
+import numpy as np
+import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import logging
 from dotenv import load_dotenv
 import os
+import time
 from pathlib import Path
 
 load_dotenv()
@@ -17,12 +22,36 @@ logging.basicConfig(
 
 class OandaClient:
     BASE_URL = os.getenv("OANDA_BASE_URL")  # Use api-fxtrade.oanda.com for live accounts OR api-fxpractice.oanda.com
+    PRICE_TTL = 1.0   # seconds a pricing response is reused for the same instruments
 
     def __init__(self, api_key):
         self.headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
         }
+        # One pooled keep-alive session: TCP/TLS set up once, not per call. Retries cover
+        # rate limits and gateway blips on GET reads only: order POSTs and trade-close PUTs
+        # may have gone through upstream, so they are never replayed.
+        # raise_on_status=False hands back the final response so the status checks below still apply.
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504],
+                      allowed_methods=frozenset({"GET"}), raise_on_status=False)
+        self.session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry))
+        self._price_cache = {}   # (endpoint, instruments) → (expires_at, payload)
+
+    def _cached_pricing(self, key, fetch):
+        """Return `fetch()`'s payload, reusing it for PRICE_TTL seconds per key (polling loops)."""
+        now = time.monotonic()
+        hit = self._price_cache.get(key)
+        if hit and hit[0] > now:
+            return hit[1]
+        payload = fetch()
+        if payload is not None:
+            if len(self._price_cache) >= 64:
+                self._price_cache = {k: v for k, v in self._price_cache.items() if v[0] > now}
+            self._price_cache[key] = (now + self.PRICE_TTL, payload)
+        return payload
 
     def get_candles(self, pair, count=200, granularity="D", price='M'):
         url = f"{self.BASE_URL}/instruments/{pair}/candles"
@@ -31,16 +60,19 @@ class OandaClient:
             "price": price,
             "granularity": granularity
         }
-        response = requests.get(url, headers=self.headers, params=params)
+        response = self.session.get(url, params=params)
         response.raise_for_status()
         return response.json()
 
     def get_price_now(self, pair):
         url = f"{self.BASE_URL}/pricing"
         params = {"instruments": pair}
-        response = requests.get(url, headers=self.headers, params=params)
-        response.raise_for_status()
-        return response.json()
+
+        def fetch():
+            response = self.session.get(url, params=params)
+            response.raise_for_status()
+            return response.json()
+        return self._cached_pricing(("pricing", pair), fetch)
 
     def place_market_order(self, account_id, instrument, units):
         """
@@ -63,7 +95,7 @@ class OandaClient:
             }
         }
         
-        response = requests.post(url, headers=self.headers, json=payload)
+        response = self.session.post(url, json=payload)
         response.raise_for_status()  # Raise an error for bad responses
         return response.json()
 
@@ -74,7 +106,7 @@ class OandaClient:
         Returns a list of trade dictionaries.
         """
         url = f"{self.BASE_URL}/accounts/{account_id}/openTrades"
-        response = requests.get(url, headers=self.headers)
+        response = self.session.get(url)
         if response.status_code == 200:
             return response.json().get("trades", [])
         else:
@@ -86,7 +118,7 @@ class OandaClient:
         Closes a trade by its trade ID.
         """
         url = f"{self.BASE_URL}/accounts/{account_id}/trades/{trade_id}/close"
-        response = requests.put(url, headers=self.headers)
+        response = self.session.put(url)
         if response.status_code == 200:
             logging.info(f"Successfully closed trade {trade_id}")
             return response.json()
@@ -96,7 +128,7 @@ class OandaClient:
         
     def get_pnl(self, account_id):
         url = f"{self.BASE_URL}/accounts/{account_id}/summary"
-        response = requests.get(url, headers=self.headers)
+        response = self.session.get(url)
         if response.status_code == 200:
             logging.info(f"Successfully retrieved account summary.")
             raw = response.json()
@@ -110,7 +142,7 @@ class OandaClient:
         Fetches the account balance from Oanda API.
         """
         url = f"{self.BASE_URL}/accounts/{account_id}"
-        response = requests.get(url, headers=self.headers)
+        response = self.session.get(url)
         print(response.text)
         account_balance = response.json()['account']['balance']
         return account_balance
@@ -118,7 +150,7 @@ class OandaClient:
     def get_total_pips(self, account_id):
     # Similar to what your dashboard does
         url = f"{self.BASE_URL}/accounts/{account_id}/openTrades"
-        response = requests.get(url, headers=self.headers)
+        response = self.session.get(url)
         total_pips = 0
 
         if response.status_code == 200:
@@ -127,10 +159,15 @@ class OandaClient:
             prices = {}
 
             if instruments:
-                price_url = f"{self.BASE_URL}/accounts/{account_id}/pricing?instruments={','.join(instruments)}"
-                price_resp = requests.get(price_url, headers=self.headers)
-                if price_resp.status_code == 200:
-                    prices = {p["instrument"]: float(p["closeoutAsk"]) for p in price_resp.json().get("prices", [])}
+                key = tuple(sorted(set(instruments)))   # one batched pricing call, cached per instrument set
+                price_url = f"{self.BASE_URL}/accounts/{account_id}/pricing?instruments={','.join(key)}"
+
+                def fetch():
+                    price_resp = self.session.get(price_url)
+                    if price_resp.status_code != 200:
+                        return None   # not cached
+                    return {p["instrument"]: float(p["closeoutAsk"]) for p in price_resp.json().get("prices", [])}
+                prices = self._cached_pricing((account_id, key), fetch) or {}
 
             for trade in trades:
                 instrument = trade["instrument"]
@@ -144,60 +181,64 @@ class OandaClient:
 
         return total_pips
     
-    def fetch_closed_trades_summary(self, account_id, start_date, end_date):
+    def _iter_closed_trades(self, account_id, page_size=500):
         """
-        Fetch closed trades summary (total trades, realized profit in SGD, and properly calculated pips).
-        Corrects pip sizing for JPY pairs based on open price.
+        Yield every closed trade, newest ID first, a full page (v20 max 500) per request,
+        walking back with `beforeID` (inclusive, hence lowest ID - 1). Pages are ordered by
+        trade ID, not close time: a trade opened long ago can close inside any window, so
+        there is no early stop before the last page.
         """
         url = f"{self.BASE_URL}/accounts/{account_id}/trades"
-        params = {
-            "state": "CLOSED"
-        }
-
-        response = requests.get(url, headers=self.headers, params=params)
-        response.raise_for_status()
-        data = response.json()
+        params = {"state": "CLOSED", "count": page_size}
+        seen = set()
+        while True:
+            response = self.session.get(url, params=params)
+            response.raise_for_status()
+            trades = response.json().get("trades", [])
+            for t in trades:
+                if t["id"] not in seen:
+                    seen.add(t["id"])
+                    yield t
 
-        total_trades = 0
-        total_realized_pl = 0.0
-        total_pips = 0.0
+            if len(trades) < page_size:
+                return   # last page
+            params["beforeID"] = min(int(t["id"]) for t in trades) - 1
 
+    def fetch_closed_trades_summary(self, account_id, start_date, end_date):
+        """
+        Fetch closed trades summary (total trades, realized profit in SGD, and properly calculated pips).
+        Corrects pip sizing for JPY pairs based on open price.
+        """
         print("\n🛠 Debugging closed trades fetched:")
 
-        for trade in data.get("trades", []):
-            close_time = trade.get("closeTime")
-            if close_time:
-                close_date = close_time[:10]
-                if start_date <= close_date <= end_date:
-                    instrument = trade.get("instrument")
-                    realized_pl = float(trade.get("realizedPL", 0.0))
-                    units = int(trade.get("initialUnits", 0))
-                    open_price = float(trade.get("price", 0.0))
-
-                    if units == 0 or open_price == 0.0:
-                        continue  # Skip invalid entries
+        cols = ["instrument", "closeTime", "realizedPL", "initialUnits", "price"]
+        df = pd.DataFrame(list(self._iter_closed_trades(account_id)), columns=cols)
 
-                    # Determine pip size
-                    pip_size = 0.01 if "JPY" in instrument else 0.0001
+        # Window + validity filter, then all the pip math as column ops
+        close_date = df["closeTime"].fillna("").str[:10]
+        realized_pl = pd.to_numeric(df["realizedPL"]).fillna(0.0).to_numpy(float)
+        units = pd.to_numeric(df["initialUnits"]).fillna(0).to_numpy(float)
+        open_price = pd.to_numeric(df["price"]).fillna(0.0).to_numpy(float)
+        in_window = ((close_date != "") & (close_date >= start_date) & (close_date <= end_date)).to_numpy()
+        keep = in_window & (units != 0) & (open_price != 0.0)   # Skip invalid entries
 
-                    # Pip value per unit (correct for JPY pairs)
-                    if "JPY" in instrument:
-                        pip_value_per_unit = pip_size / open_price
-                    else:
-                        pip_value_per_unit = pip_size
+        instrument = df["instrument"].to_numpy()[keep]
+        realized_pl, units, open_price = realized_pl[keep], units[keep], open_price[keep]
 
-                    # Calculate pips
-                    pips = abs(realized_pl) / (abs(units) * pip_value_per_unit)
+        # Pip size, and pip value per unit (correct for JPY pairs: quoted per the open price)
+        is_jpy = np.array(["JPY" in i for i in instrument], dtype=bool)
+        pip_size = np.where(is_jpy, 0.01, 0.0001)
+        pip_value_per_unit = np.where(is_jpy, pip_size / open_price, pip_size)
 
-                    # Keep sign same as realizedPL
-                    if realized_pl < 0:
-                        pips = -pips
+        # Pips, sign kept the same as realizedPL
+        pips = np.sign(realized_pl) * np.abs(realized_pl) / (np.abs(units) * pip_value_per_unit)
 
-                    print(f"🔹 {instrument} | Units: {units} | Open: {open_price:.5f} | RealizedPL: {realized_pl:.4f} | Pips: {pips:.1f}")
+        for row in zip(instrument, units, open_price, realized_pl, pips):
+            print("🔹 {} | Units: {:.0f} | Open: {:.5f} | RealizedPL: {:.4f} | Pips: {:.1f}".format(*row))
 
-                    total_realized_pl += realized_pl
-                    total_pips += pips
-                    total_trades += 1
+        total_trades = int(keep.sum())
+        total_realized_pl = float(realized_pl.sum())
+        total_pips = float(pips.sum())
 
         print(f"\n✅ Total Trades: {total_trades}")
         print(f"✅ Total Realized Profit (SGD): {round(total_realized_pl, 2)}")
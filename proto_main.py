@@ -1,25 +1,30 @@
 import os
-import json
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import re
-import pyperclip
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 from pathlib import Path
+from functools import lru_cache
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
-from core.formatter import format_markdown, update_markdown_file
+from core.formatter import format_markdown, update_markdown_file, write_text_atomic
 from core.chart_generator import generate_basket_pips_chart, slice_image_for_instagram, generate_instagram_cover
 from tools.mover import rename_and_move_blog_file
 from core.post_saver import git_commit_and_push
-from collections import defaultdict
-import time
-import ast
+from core.console_log import configure_console_logging
+from core.log_filter import extract_filtered_logs, filtered_logs_to_text
+import heapq
 from core.browser_automation import (
     create_driver,
     run_chatgpt_blog_prompt,
     click_markdown_links, 
     extract_last_fenced_markdown,
-    extract_last_response_markdown
+    extract_last_response_markdown,
+    quit_driver,
     )
 from typing import List, Dict
 
@@ -38,126 +43,72 @@ GRAPH_IMG_PATH = f"{BASKET_PIPS_DIRECTORY}/pips_chart_{BLOG_ID}.png"
 INSTA_IMG_PATH = f"{HOME}/Downloads/instaskyengine/"
 LOGO_PATH = f"{HOME}/Documents/MacTrader/SkyeFX/SkyEngine/assets/skyefx_logo.png"
 MARKDOWN_BLOG_FILE = f"{HOME}/Downloads/blog_post.md"
-
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-def generate_post(prompt):
-    response = client.chat.completions.create(
+FRONTMATTER_BLOCK_RE = re.compile(r"^---\n(.*?)\n---\n", flags=re.DOTALL)
+SLUG_LINE_RE = re.compile(r"(?m)^\s*slug\s*:\s*(.+?)\s*$")
+
+# The SDK retries 429s, 5xx and timeouts itself with exponential backoff; 3 attempts after the
+# first before the nightly run gives up
+client = OpenAI(api_key=OPENAI_API_KEY, max_retries=3)
+
+# Slack webhook POSTs retry only where the message can't have been delivered yet: failed
+# connects and 429s (Retry-After honoured). Read errors / 5xx aren't retried, to avoid double posts.
+slack_session = requests.Session()
+slack_session.mount("https://", HTTPAdapter(max_retries=Retry(
+    total=3, connect=3, read=0, backoff_factor=1, status_forcelist=[429],
+    allowed_methods=frozenset({"POST"}), raise_on_status=False)))
+
+def generate_post(prompt, stream_to=None):
+    # Streamed: tokens are consumed as they arrive, and with `stream_to` the raw markdown is
+    # written to that file while generation is still running (format it afterwards as usual)
+    stream = client.chat.completions.create(
         model="gpt-4o",
         messages=[{"role": "user", "content": prompt}],
         max_tokens=2000,
-        temperature=0.7
+        temperature=0.7,
+        stream=True,
+        stream_options={"include_usage": True}
     )
 
-    message = response.choices[0].message.content
+    parts = []
+    usage = None
+    with (open(stream_to, "w") if stream_to else nullcontext()) as out:
+        for chunk in stream:
+            if chunk.usage:   # sent on the final, choice-less chunk
+                usage = chunk.usage
+            if chunk.choices:
+                delta = chunk.choices[0].delta.content or ""
+                parts.append(delta)
+                if out:
+                    out.write(delta)
+    message = "".join(parts)
 
     # Print token usage
-    if response.usage:
+    if usage:
         print(f"🧠 Token usage:")
-        print(f"   → Prompt tokens:     {response.usage.prompt_tokens}")
-        print(f"   → Completion tokens: {response.usage.completion_tokens}")
-        print(f"   → Total tokens:      {response.usage.total_tokens}")
+        print(f"   → Prompt tokens:     {usage.prompt_tokens}")
+        print(f"   → Completion tokens: {usage.completion_tokens}")
+        print(f"   → Total tokens:      {usage.total_tokens}")
 
     return message
 
 
-def read_log_file(filepath):
-    with open(filepath, 'r') as file:
-        return [json.loads(line) for line in file if line.strip()]
-    
-def extract_filtered_logs(logs):
-    snapshots = [log for log in logs if log["type"] == "snapshot"]
-    news_events = []
-    seen_news = set()
-    for log in logs:
-        if log["type"] == "news_event":
-            identifier = (log["title"], log["timestamp"])
-            if identifier not in seen_news:
-                news_events.append(log)
-                seen_news.add(identifier)
-    # Helper: normalize to YYYY-MM-DDTHH:MM (truncate to the minute)
-    def get_minute_bucket(ts):
-        dt = datetime.fromisoformat(ts)
-        return dt.replace(second=0, microsecond=0).isoformat()
-    # Group snapshots into baskets using the minute
-    basket_groups = defaultdict(list)
-    for snap in snapshots:
-        minute_key = get_minute_bucket(snap["timestamp"])
-        basket_groups[minute_key].append(snap)
-    # Compute total basket pips for each group
-    basket_scores = {}  # timestamp → total basket pips
-    for ts, snaps in basket_groups.items():
-        total_pips = sum(s["pips"] for s in snaps if "pips" in s)
-        basket_scores[ts] = total_pips
-    # Identify highest and lowest basket totals
-    highest_basket_pips = float('-inf')
-    lowest_basket_pips = float('inf')
-    highest_basket_ts = []
-    lowest_basket_ts = []
-    for ts, total_pips in basket_scores.items():
-        if total_pips > highest_basket_pips:
-            highest_basket_pips = total_pips
-            highest_basket_ts = [ts]
-        elif total_pips == highest_basket_pips:
-            highest_basket_ts.append(ts)
-        #logic test
-        if total_pips < lowest_basket_pips:
-            lowest_basket_pips = total_pips
-            lowest_basket_ts = [ts]
-        elif total_pips == lowest_basket_pips:
-            lowest_basket_ts.append(ts)
-    # Gather snapshots for those baskets
-    highest_basket = [snap for ts in highest_basket_ts for snap in basket_groups[ts]]
-    lowest_basket = [snap for ts in lowest_basket_ts for snap in basket_groups[ts]]
-    # Inject summary entries
-    summary_entries = []
-    if highest_basket_ts:
-        summary_entries.append({
-            "type": "basket_summary",
-            "label": "Highest Basket",
-            "timestamp": highest_basket_ts[0],
-            "basket_total_pips": round(highest_basket_pips, 1)
-        })
-    if lowest_basket_ts:
-        summary_entries.append({
-            "type": "basket_summary",
-            "label": "Lowest Basket",
-            "timestamp": lowest_basket_ts[0],
-            "basket_total_pips": round(lowest_basket_pips, 1)
-        })
-    # Snapshots ±1 hour around news events
-    related_snapshots = []
-    for event in news_events:
-        event_time = datetime.fromisoformat(event["timestamp"])
-        window_start = event_time - timedelta(hours=1)
-        window_end = event_time + timedelta(hours=1)
-        #loop
-        for ts, snaps in basket_groups.items():
-            basket_time = datetime.fromisoformat(ts)
-            if window_start <= basket_time <= window_end:
-                related_snapshots.extend(snaps)
-    # First and last basket of the day
-    sorted_basket_times = sorted(basket_groups.keys())
-    first_basket = basket_groups[sorted_basket_times[0]] if sorted_basket_times else []
-    last_basket = basket_groups[sorted_basket_times[-1]] if sorted_basket_times else []
-    # Combine and deduplicate
-    combined_logs = (
-        news_events +
-        related_snapshots +
-        first_basket +
-        last_basket +
-        highest_basket +
-        lowest_basket +
-        summary_entries
-    )
-    unique_logs = {json.dumps(log, sort_keys=True): log for log in combined_logs}
-    sorted_logs = sorted(unique_logs.values(), key=lambda x: x["timestamp"])
-    return "\n".join([json.dumps(log) for log in sorted_logs])
+def read_log_file(filepath, allowed_types=None):
+    # One-shot read (fewer syscalls than the buffered line iterator; matters on the external volume);
+    # lines stay bytes so orjson skips the UTF-8 decode round-trip
+    lines = Path(filepath).read_bytes().splitlines()
+    if not allowed_types:
+        return [orjson.loads(line) for line in lines if line.strip()]
 
+    # Lines that can't carry an allowed type are never parsed: a quoted type name must appear
+    # in the raw bytes. The substring test can over-match, so the parsed type is checked too.
+    markers = [f'"{t}"'.encode() for t in allowed_types]
+    entries = (orjson.loads(line) for line in lines if any(m in line for m in markers))
+    return [entry for entry in entries if entry.get("type") in allowed_types]
+    
 def prepare_instagram_summary(logs):
-    # If logs are strings, try to parse safely
-    raw = logs.split('\n')
-    logs = [ast.literal_eval(line) for line in raw]
+    # Takes select_prompt_logs' entries as-is; JSON-lines text (filtered_logs_to_text) is still accepted
+    if isinstance(logs, str):
+        logs = [orjson.loads(line) for line in logs.splitlines() if line.strip()]
 
     # Get the highest basket summary
     highest_basket = next(
@@ -175,10 +126,9 @@ def prepare_instagram_summary(logs):
             if pair not in latest_snapshot_per_pair or ts > latest_snapshot_per_pair[pair]["timestamp"]:
                 latest_snapshot_per_pair[pair] = entry
 
-    # Top 3 performers by pips
-    sorted_by_pips = sorted(latest_snapshot_per_pair.values(), key=lambda x: x["pips"], reverse=True)
-    print(sorted_by_pips)
-    top_performers = [(entry['pair'],entry['pips']) for entry in sorted_by_pips[:3]]
+    # Top 3 performers by pips (partial selection, no full sort)
+    top3 = heapq.nlargest(3, latest_snapshot_per_pair.values(), key=lambda x: x["pips"])
+    top_performers = [(entry['pair'],entry['pips']) for entry in top3]
     # top_performers = [entry['pair'] for entry in sorted_by_pips[:3]]
 
     # Title date based on first timestamp
@@ -195,9 +145,13 @@ def prepare_instagram_summary(logs):
         "logo_path": LOGO_PATH
     }
 
+@lru_cache(maxsize=None)
+def _load_template(path):
+    with open(path, "r") as file:
+        return file.read()
+
 def create_prompt_from_log(log_data):
-    with open(DAILY_SNAPSHOT_PROMPT, "r") as file:
-        prompt_raw = file.read()
+    prompt_raw = _load_template(DAILY_SNAPSHOT_PROMPT)
     return f"""{prompt_raw}\n\n{log_data}"""
 
 def save_to_markdown(content, save_dir="/your/custom/path/here"):
@@ -205,8 +159,7 @@ def save_to_markdown(content, save_dir="/your/custom/path/here"):
     formatted = format_markdown(content)
     filename = datetime.now().strftime("trade_summary_%Y-%m-%d.md")
     filepath = os.path.join(save_dir, filename)
-    with open(filepath, "w") as f:
-        f.write(formatted)
+    write_text_atomic(filepath, formatted)
     return filepath
 
 def delete_old_md_file(file_path):
@@ -228,12 +181,12 @@ def read_slug_from_markdown(md_path: str) -> str:
         return ""
     text = p.read_text(encoding="utf-8", errors="ignore")
     # Grab the first frontmatter block at the top
-    m = re.match(r"^---\n(.*?)\n---\n", text, flags=re.DOTALL)
+    m = FRONTMATTER_BLOCK_RE.match(text)
     if not m:
         return ""
     fm_block = m.group(1)
     # Fast path: simple regex for slug: <value> (no YAML import needed)
-    m_slug = re.search(r"(?m)^\s*slug\s*:\s*(.+?)\s*$", fm_block)
+    m_slug = SLUG_LINE_RE.search(fm_block)
     if not m_slug:
         return ""
     raw = m_slug.group(1).strip()
@@ -249,14 +202,14 @@ def notify_slack(filepath):
     payload = {
         "text": f":memo: *New Trade Summary Generated!* Check it out below.\n\n{blog_url}"
     }
-    response = requests.post(SLACK_WEBHOOK_URL, json=payload)
+    response = slack_session.post(SLACK_WEBHOOK_URL, json=payload, timeout=10)
     return response.status_code == 200
 
 if __name__ == "__main__":
-    log_data = read_log_file(LOG_FILE_PATH)
-    filtered_log_text = extract_filtered_logs(log_data)
+    configure_console_logging()
+    log_data = read_log_file(LOG_FILE_PATH, allowed_types={"snapshot", "news_event"})
+    filtered_log_text = filtered_logs_to_text(extract_filtered_logs(log_data))
     prompt = create_prompt_from_log(filtered_log_text)
-    pyperclip.copy(prompt)
     print(f"This is the generated prompt\n\n{prompt}\n\n")
     print(len(prompt))
 
@@ -266,33 +219,37 @@ if __name__ == "__main__":
         profile_directory="Default",
         headless=False
     )
-    try:
-        PROJECT_URL = "https://chatgpt.com/g/g-p-67ea53558d1c81918dedc2e3043c087a-project-murmur/project"
-        date_str = datetime.now().strftime("%Y-%m-%d")
-
-        run_chatgpt_blog_prompt(prompt, driver, wait_time=60, project_url=PROJECT_URL)
-        content = extract_last_response_markdown(driver, wait_seconds=60)
-        print(f'\n\nThis is the content\n\n{content}\n\n')
-
-        # Save -> format -> move
-        md_filepath = save_to_markdown(content, SAVE_DIRECTORY)
-        update_markdown_file(md_filepath)
-        moved_path = rename_and_move_blog_file(
-            SAVE_DIRECTORY,                # <-- source dir (not Downloads anymore)
-            BLOG_COMPLETED_DIRECTORY,      # <-- destination
-            "trade_summary",               # base name
-            date_str                       # use the same date string you're committing with
-        )
-        if not moved_path:
-            raise RuntimeError("Could not move markdown file; nothing matched in SAVE_DIRECTORY.")
-
-        # Charts + git + slack
-        generate_basket_pips_chart(LOG_FILE_PATH, GRAPH_IMG_PATH)
-        time.sleep(3)
-        git_commit_and_push(
-            BLOG_DIRECTORY,
-            [f"{BLOG_COMPLETED_DIRECTORY}/trade_summary_{date_str}.md", GRAPH_IMG_PATH]
-        )
-        notify_slack(f"{BLOG_COMPLETED_DIRECTORY}/trade_summary_{date_str}.md")
-    finally:
-        driver.quit()
+    # Blocking side work overlaps the browser session: the chart (reads only the log file)
+    # renders while ChatGPT answers, and the Slack post is in flight while the browser quits
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        try:
+            chart = ex.submit(generate_basket_pips_chart, LOG_FILE_PATH, GRAPH_IMG_PATH)
+            PROJECT_URL = "https://chatgpt.com/g/g-p-67ea53558d1c81918dedc2e3043c087a-project-murmur/project"
+            date_str = datetime.now().strftime("%Y-%m-%d")
+
+            run_chatgpt_blog_prompt(prompt, driver, wait_time=60, project_url=PROJECT_URL)
+            content = extract_last_response_markdown(driver, wait_seconds=60)
+            print(f'\n\nThis is the content\n\n{content}\n\n')
+
+            # Save -> format -> move
+            md_filepath = save_to_markdown(content, SAVE_DIRECTORY)
+            update_markdown_file(md_filepath)
+            moved_path = rename_and_move_blog_file(
+                SAVE_DIRECTORY,                # <-- source dir (not Downloads anymore)
+                BLOG_COMPLETED_DIRECTORY,      # <-- destination
+                "trade_summary",               # base name
+                date_str                       # use the same date string you're committing with
+            )
+            if not moved_path:
+                raise RuntimeError("Could not move markdown file; nothing matched in SAVE_DIRECTORY.")
+
+            # Charts + git + slack
+            chart.result()   # the PNG is fully written once this returns
+            git_commit_and_push(
+                BLOG_DIRECTORY,
+                [f"{BLOG_COMPLETED_DIRECTORY}/trade_summary_{date_str}.md", GRAPH_IMG_PATH]
+            )
+            notified = ex.submit(notify_slack, f"{BLOG_COMPLETED_DIRECTORY}/trade_summary_{date_str}.md")
+        finally:
+            quit_driver(driver)   # also removes the cloned temp profile
+    notified.result()   # surface a failed Slack post like the inline call did
@@ -1,18 +1,21 @@
 import os
-import json
+import orjson
+import re
 import requests
-import pyperclip
 from datetime import datetime
 from dotenv import load_dotenv
 from pathlib import Path
+from functools import lru_cache
 from openai import OpenAI
 from core.formatter import format_markdown
 from tools.mover import rename_and_move_blog_file
 from core.post_saver import git_commit_and_push
+from core.console_log import configure_console_logging
 from core.browser_automation import (
     create_driver,
     run_chatgpt_blog_prompt,
     click_markdown_links,
+    quit_driver,
 )
 import time
 
@@ -25,15 +28,26 @@ SIGNALS_FILE = f"{HOME}/Documents/MacTrader/EchoAPI/signals-amber.json"
 PROMPT_TEMPLATE = f"{HOME}/Documents/MacTrader/Murmur/Core/prompts/signal_gen_prompt.txt"
 BLOG_DIRECTORY = f"{HOME}/Documents/MacTrader/Murmur/Shell/astro-paper/"
 BLOG_COMPLETED_DIRECTORY = f"{BLOG_DIRECTORY}/src/data/blog/"
-MARKDOWN_BLOG_FILE = f"{HOME}/Downloads/blog_post.md"
+DOWNLOAD_DIR = f"{HOME}/Downloads/"
+MARKDOWN_BLOG_FILE = f"{DOWNLOAD_DIR}blog_post.md"
+SIGNAL_DATE_RE = re.compile(rb'"date"\s*:\s*"(\d{4}-\d{2}-\d{2})"')
+PROJECT_URL = "https://chatgpt.com/g/g-p-67ea53558d1c81918dedc2e3043c087a-project-murmur/project"
 
 client = OpenAI(api_key=OPENAI_API_KEY)
 
+def read_signal_date():
+    # The top-level "date" usually sits in the first bytes of the file: read just those and
+    # only parse the whole (possibly multi-MB) file when it isn't unambiguously there
+    with open(SIGNALS_FILE, 'rb') as f:
+        head = f.read(256)
+    m = SIGNAL_DATE_RE.search(head)
+    if m and head.count(b"{", 0, m.start()) == 1 and b"[" not in head[:m.start()]:
+        return m.group(1).decode()
+    return load_signals().get("date")
+
 def should_run_blog():
     try:
-        with open(SIGNALS_FILE, 'r') as f:
-            signals_data = json.load(f)
-        signal_date_str = signals_data.get("date")
+        signal_date_str = read_signal_date()
         if not signal_date_str:
             print("❌ No 'date' found in signal file.")
             return False
@@ -53,16 +67,18 @@ def should_run_blog():
         return False
 
 def load_signals():
-    with open(SIGNALS_FILE, 'r') as f:
-        return json.load(f)
+    # Raw bytes straight into the parser: no text-mode decode pass
+    return orjson.loads(Path(SIGNALS_FILE).read_bytes())
 
+@lru_cache(maxsize=None)
 def load_prompt_template():
     with open(PROMPT_TEMPLATE, 'r') as f:
         return f.read()
 
 def build_prompt(signal_data):
     prompt = load_prompt_template()
-    return f"{prompt.strip()}\n\n{json.dumps(signal_data, indent=2)}"
+    signals = orjson.dumps(signal_data, option=orjson.OPT_INDENT_2).decode("utf-8")
+    return f"{prompt.strip()}\n\n{signals}"
 
 def delete_old_md_file(file_path):
     if os.path.exists(file_path):
@@ -79,26 +95,35 @@ def notify_slack(filepath):
     response = requests.post(SLACK_WEBHOOK_URL, json=payload)
     return response.status_code == 200
 
-if __name__ == "__main__":
+def run_prompts(driver, prompts, md_links):
+    """Run each prompt in the same browser session; the driver is created/quit by the caller."""
+    for prompt in prompts:
+        run_chatgpt_blog_prompt(prompt, driver, wait_time=60, project_url=PROJECT_URL)
+        click_markdown_links(driver, md_links, download_dir=DOWNLOAD_DIR)
+
+def main():
+    configure_console_logging()
     if not should_run_blog():
-        exit(0)
+        return
 
     signal_data = load_signals()
     prompt = build_prompt(signal_data)
-    pyperclip.copy(prompt)
-    print("✏️ Prompt copied to clipboard. You can now paste it into ChatGPT browser.")
     print(f"Prompt preview:\n\n{prompt}\n\n")
     delete_old_md_file(MARKDOWN_BLOG_FILE)
     all_md_links = ["blog_post.md"]
+
+    # One driver for the whole run: Chromium + profile start-up is paid once
     driver = create_driver()
     try:
-        run_chatgpt_blog_prompt(prompt, driver, wait_time=60)
-        click_markdown_links(driver, all_md_links)
+        run_prompts(driver, [prompt], all_md_links)
     finally:
-        driver.quit()
+        quit_driver(driver)
 
     date_str = datetime.now().strftime("%Y-%m-%d")
-    rename_and_move_blog_file(f"{HOME}/Downloads/", BLOG_COMPLETED_DIRECTORY, "signal_summary")
+    rename_and_move_blog_file(DOWNLOAD_DIR, BLOG_COMPLETED_DIRECTORY, "signal_summary")
     blog_path = f"{BLOG_COMPLETED_DIRECTORY}/signal_summary_{date_str}.md"
     git_commit_and_push(BLOG_DIRECTORY, [blog_path])
     notify_slack(blog_path)
+
+if __name__ == "__main__":
+    main()
@@ -24,26 +24,29 @@ def rename_and_move_blog_file(download_dir, blog_dest, file_name, date_str=None)
         print(f"⚠️ Source directory not found: {download_dir}")
         return None
 
-    # Gather candidates
-    all_md = [f for f in os.listdir(download_dir) if f.lower().endswith(".md")]
-    if not all_md:
+    # One scandir pass keeping the newest file per priority bucket (mtime from the DirEntry;
+    # ctime on macOS is inode-change time, not creation). Nothing is materialized.
+    newest = {}   # bucket → (mtime, name); 0 = trade_summary_*, 1 = blog_post*, 2 = any .md
+    with os.scandir(download_dir) as it:
+        for e in it:
+            name = e.name
+            if not name.lower().endswith(".md") or not e.is_file():
+                continue
+            m = e.stat().st_mtime
+            buckets = (2,)
+            if name.startswith("trade_summary_"):
+                buckets = (0, 2)
+            elif name.startswith("blog_post"):
+                buckets = (1, 2)
+            for b in buckets:
+                if b not in newest or m > newest[b][0]:
+                    newest[b] = (m, name)
+    if not newest:
         print("⚠️ No markdown files found to move.")
         return None
 
-    def newest(paths):
-        return max(paths, key=lambda f: os.path.getctime(os.path.join(download_dir, f)))
-
-    # Priority buckets
-    ts_candidates = [f for f in all_md if f.startswith("trade_summary_")]
-    bp_candidates = [f for f in all_md if f.startswith("blog_post")]
-
-    if ts_candidates:
-        original = newest(ts_candidates)
-    elif bp_candidates:
-        original = newest(bp_candidates)
-    else:
-        # Fallback: newest .md in the directory
-        original = newest(all_md)
+    # Priority buckets (the fallback is the newest .md in the directory)
+    original = newest[min(newest)][1]
 
     original_path = os.path.join(download_dir, original)
 
@@ -54,13 +57,13 @@ def rename_and_move_blog_file(download_dir, blog_dest, file_name, date_str=None)
     new_filename = f"{file_name}_{date_str}.md"   # e.g., "trade_summary_2025-08-23.md"
     new_path = os.path.join(blog_dest, new_filename)
 
-    # If destination exists, overwrite (atomic-ish replace)
+    # Same filesystem: one atomic rename(2) that also overwrites an existing destination.
+    # Across filesystems (EXDEV) fall back to shutil's copy + unlink.
     try:
+        os.replace(original_path, new_path)
+    except OSError:
         if os.path.exists(new_path):
             os.remove(new_path)
-    except Exception:
-        pass
-
-    shutil.move(original_path, new_path)
+        shutil.move(original_path, new_path)
     print(f"✅ Renamed and moved: {original} → {new_filename}")
     return new_path
\ No newline at end of file